@@ -30,7 +30,7 @@ target_metadata = SQLModel.metadata
 # ... etc.
 
 def get_url():
-    return str(settings.SQLALCHEMY_DATABASE_URI)
+    return settings.database_url
 
 
 def run_migrations_offline() -> None:
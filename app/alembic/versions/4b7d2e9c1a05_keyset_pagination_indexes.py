@@ -0,0 +1,33 @@
+"""keyset pagination indexes
+
+Revision ID: 4b7d2e9c1a05
+Revises: cf5a60e9bdd8
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7d2e9c1a05'
+down_revision: Union[str, Sequence[str], None] = 'cf5a60e9bdd8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_user_created_date_id', 'user', ['created_date', 'id'], unique=False)
+    op.create_index('ix_operadora_created_date_id', 'operadora', ['created_date', 'id'], unique=False)
+    op.create_index('ix_guia_created_date_id', 'guia', ['created_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_guia_created_date_id', table_name='guia')
+    op.drop_index('ix_operadora_created_date_id', table_name='operadora')
+    op.drop_index('ix_user_created_date_id', table_name='user')
@@ -0,0 +1,63 @@
+"""operadora stats
+
+Revision ID: 7b1e9f3a5c28
+Revises: e4a7c2d9b316
+Create Date: 2026-10-18 22:05:47.613902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b1e9f3a5c28'
+down_revision: Union[str, Sequence[str], None] = 'e4a7c2d9b316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('operadora_stats',
+    sa.Column('id_operadora', sa.Integer(), nullable=False),
+    sa.Column('guias', sa.Integer(), nullable=False),
+    sa.Column('calificaciones', sa.Integer(), nullable=False),
+    sa.Column('calificacion_sum', sa.Float(), nullable=False),
+    sa.Column('updated_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['id_operadora'], ['operadora.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_operadora')
+    )
+    op.create_table('operadora_idioma_stats',
+    sa.Column('id_operadora', sa.Integer(), nullable=False),
+    sa.Column('idioma', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('guias', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['id_operadora'], ['operadora.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_operadora', 'idioma')
+    )
+    if op.get_bind().dialect.name != 'postgresql':
+        # Elsewhere: python -m app.stats rebuild
+        return
+    # Same counts as app.stats.aggregate; guia writes wait until the backfill commits
+    op.execute('LOCK TABLE guia IN SHARE MODE')
+    op.execute(
+        "INSERT INTO operadora_stats (id_operadora, guias, calificaciones, calificacion_sum, updated_date) "
+        "SELECT id_operadora, count(*), count(calificacion), coalesce(sum(calificacion), 0), now() "
+        "FROM guia WHERE id_operadora IS NOT NULL GROUP BY id_operadora"
+    )
+    op.execute(
+        "INSERT INTO operadora_idioma_stats (id_operadora, idioma, guias) "
+        "SELECT guia.id_operadora, idioma.value, count(*) "
+        "FROM guia CROSS JOIN LATERAL (SELECT DISTINCT value FROM jsonb_array_elements_text("
+        "CASE WHEN jsonb_typeof(guia.idiomas) = 'array' THEN guia.idiomas END)) idioma "
+        "WHERE guia.id_operadora IS NOT NULL "
+        "GROUP BY guia.id_operadora, idioma.value"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('operadora_idioma_stats')
+    op.drop_table('operadora_stats')
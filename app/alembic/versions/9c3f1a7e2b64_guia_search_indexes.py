@@ -0,0 +1,49 @@
+"""guia search indexes
+
+Revision ID: 9c3f1a7e2b64
+Revises: 4b7d2e9c1a05
+Create Date: 2026-10-18 14:36:05.271940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f1a7e2b64'
+down_revision: Union[str, Sequence[str], None] = '4b7d2e9c1a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('guia', 'idiomas',
+                        existing_type=sa.JSON(),
+                        type_=postgresql.JSONB(none_as_null=True),
+                        existing_nullable=True,
+                        postgresql_using='idiomas::jsonb')
+        # Rows written before none_as_null hold a JSON 'null'; store SQL NULL so
+        # containment queries and the GIN index only see real arrays
+        op.execute("UPDATE guia SET idiomas = NULL WHERE jsonb_typeof(idiomas) <> 'array'")
+        op.create_index('ix_guia_idiomas', 'guia', ['idiomas'], unique=False, postgresql_using='gin')
+    op.create_index('ix_guia_id_operadora_calificacion', 'guia', ['id_operadora', 'calificacion'], unique=False)
+    op.create_index('ix_guia_calificacion', 'guia', ['calificacion'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_guia_calificacion', table_name='guia')
+    op.drop_index('ix_guia_id_operadora_calificacion', table_name='guia')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_guia_idiomas', table_name='guia', postgresql_using='gin')
+        op.alter_column('guia', 'idiomas',
+                        existing_type=postgresql.JSONB(none_as_null=True),
+                        type_=sa.JSON(),
+                        existing_nullable=True,
+                        postgresql_using='idiomas::json')
@@ -0,0 +1,60 @@
+"""user and operadora search indexes
+
+Revision ID: d81e5b3c7f20
+Revises: 9c3f1a7e2b64
+Create Date: 2026-10-18 16:02:47.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81e5b3c7f20'
+down_revision: Union[str, Sequence[str], None] = '9c3f1a7e2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match the expressions built by app.api.search.text_search. coalesce keeps a row
+# with a NULL column searchable; concat_ws would too, but it isn't IMMUTABLE.
+INDEXES = {
+    'ix_user_search': '"user" USING gin '
+                      "(to_tsvector('simple'::regconfig, "
+                      "f_unaccent(coalesce(nombre, '') || ' ' || coalesce(apellido, ''))))",
+    'ix_user_cedula_trgm': '"user" USING gin (cedula gin_trgm_ops)',
+    'ix_user_email_trgm': '"user" USING gin (lower(email) gin_trgm_ops)',
+    'ix_operadora_search': "operadora USING gin "
+                           "(to_tsvector('simple'::regconfig, "
+                           "f_unaccent(coalesce(nombre, '') || ' ' || coalesce(razon_social, ''))))",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # unaccent() is only STABLE; the dictionary-qualified call wrapped as IMMUTABLE can be indexed
+    op.execute(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+    )
+    # CONCURRENTLY keeps the multi-million row user table writable while indexing
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    op.execute('DROP FUNCTION IF EXISTS f_unaccent(text)')
@@ -0,0 +1,101 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Iterable, Mapping
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import Row, func, or_
+from sqlmodel import select
+from sqlmodel.sql.expression import Select
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """Collects the keys requested during one event loop iteration and fetches
+    them with a single ``fetch(keys)`` call, DataLoader style.
+
+    ``fetch`` returns a mapping; keys it leaves out resolve to ``default``.
+    Results are memoized per key, so a loader belongs to one request. Loaders
+    sharing an AsyncSession must be awaited one after the other, since the
+    session can't run two statements at once.
+    """
+
+    def __init__(self, fetch: Callable[[list[K]], Awaitable[Mapping[K, V]]], default: V | None = None):
+        self.fetch = fetch
+        self.default = default
+        self.batches = 0
+        self._futures: dict[K, asyncio.Future] = {}
+        self._queued: list[K] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    def load(self, key: K) -> Awaitable[V]:
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            if not self._queued:
+                loop.call_soon(self._dispatch)
+            self._queued.append(key)
+        return future
+
+    def load_many(self, keys: Iterable[K]) -> Awaitable[list[V]]:
+        # Not a coroutine, so the keys join the current batch right away
+        return asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self) -> None:
+        keys, self._queued = self._queued, []
+        task = asyncio.create_task(self._run(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: list[K]) -> None:
+        futures = [self._futures[key] for key in keys]
+        self.batches += 1
+        try:
+            results = await self.fetch(keys)
+        except BaseException as exc:
+            for key, future in zip(keys, futures):
+                # Not memoized, so a later load retries the key
+                self._futures.pop(key, None)
+                if future.done():
+                    continue
+                if isinstance(exc, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for key, future in zip(keys, futures):
+            if not future.done():
+                future.set_result(results.get(key, self.default))
+
+
+async def partitioned_pages(
+        session: Any, statement: Select, partition: Any, order_by: Iterable[Any], keys: list[Any],
+        offset: int, limit: int
+) -> dict[Any, tuple[list[Row], int]]:
+    """Page ``offset:offset + limit`` of each ``partition`` group in ``keys``, with
+    the group's total, in a single window-function query.
+
+    Keys without rows map to ``([], 0)``.
+    """
+    numbered = statement.where(partition.in_(keys)).add_columns(
+        partition.label("_partition"),
+        func.row_number().over(partition_by=partition, order_by=list(order_by)).label("_row"),
+        func.count().over(partition_by=partition).label("_total"),
+    ).subquery()
+    row, total = numbered.c._row, numbered.c._total
+    rows = (await session.exec(
+        select(*numbered.c)
+        # A page past the end still returns the group's last row, just for its total
+        .where(or_((row > offset) & (row <= offset + limit), (row == total) & (total <= offset)))
+        .order_by(numbered.c._partition, row)
+    )).all()
+    pages: dict[Any, tuple[list[Row], int]] = {key: ([], 0) for key in keys}
+    for row in rows:
+        items, _ = pages[row._partition]
+        if row._row > offset:
+            items.append(row)
+        pages[row._partition] = (items, row._total)
+    return pages
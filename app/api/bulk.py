@@ -0,0 +1,194 @@
+import itertools
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, Generic, TypeVar
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlmodel import select
+
+from app.core.config import settings
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: Any
+
+
+class BulkResult(BaseModel, Generic[T]):
+    items: list[T] = []
+    errors: list[BulkItemError] = []
+
+
+class BulkDeleteResult(BaseModel, Generic[T]):
+    deleted: list[T] = []
+    errors: list[BulkItemError] = []
+
+
+def chunked(items: Sequence[T], size: int = settings.BULK_CHUNK_SIZE) -> Iterator[Sequence[T]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _validation_error(index: int, exc: ValidationError) -> BulkItemError:
+    return BulkItemError(index=index, detail=jsonable_encoder(exc.errors(include_url=False)))
+
+
+def validate_items(
+        payload: list[dict[str, Any]], schema: type[M], indexes: Iterable[int] | None = None
+) -> tuple[list[tuple[int, M]], list[BulkItemError]]:
+    """Validate each item as ``schema``; ``indexes`` numbers them when they aren't 0, 1, 2..."""
+    valid: list[tuple[int, M]] = []
+    errors: list[BulkItemError] = []
+    for index, raw in zip(itertools.count() if indexes is None else indexes, payload):
+        try:
+            valid.append((index, schema.model_validate(raw)))
+        except ValidationError as exc:
+            errors.append(_validation_error(index, exc))
+    return valid, errors
+
+
+def table_rows(
+        model: Any, items: list[tuple[int, BaseModel]], errors: list[BulkItemError], **update: Any
+) -> list[tuple[int, dict[str, Any]]]:
+    """``(index, row)`` for ``bulk_insert``, built by validating each item as ``model``.
+
+    The table model can be stricter than the create schema (e.g. a field the
+    schema defaults to None), so an item it rejects becomes that item's error.
+    """
+    rows = []
+    for index, item in items:
+        try:
+            rows.append((index, model.model_validate(item, update=update).model_dump()))
+        except ValidationError as exc:
+            errors.append(_validation_error(index, exc))
+    return rows
+
+
+def reject_duplicates(
+        items: list[tuple[int, M]], key: str, taken: set[Any], detail: str, errors: list[BulkItemError]
+) -> list[tuple[int, M]]:
+    """Drop items whose ``key`` is already taken in the database or earlier in the batch."""
+    kept = []
+    for index, item in items:
+        value = getattr(item, key)
+        if value is not None and value in taken:
+            errors.append(BulkItemError(index=index, detail=detail))
+            continue
+        if value is not None:
+            taken.add(value)
+        kept.append((index, item))
+    return kept
+
+
+# Failures caused by one row's values, e.g. a duplicate key or a NUL byte in a string
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+def _integrity_detail(exc: IntegrityError | DataError) -> str:
+    return str(exc.orig).splitlines()[0]
+
+
+async def _commit_detached(session: Any, objects: Sequence[Any]) -> None:
+    # Detach committed rows so a later chunk's rollback can't expire them
+    await session.commit()
+    for obj in objects:
+        session.expunge(obj)
+
+
+async def bulk_insert(session: Any, model: Any, rows: list[tuple[int, dict[str, Any]]]) -> BulkResult:
+    """Insert ``rows`` with one multi-row INSERT ... RETURNING and commit per chunk.
+
+    A chunk that violates a constraint or holds a value the column rejects
+    is retried row by row so only the offending items are reported as errors.
+    """
+    result = BulkResult()
+    statement = insert(model).returning(model, sort_by_parameter_order=True)
+    for chunk in chunked(rows):
+        try:
+            created = (await session.exec(statement, params=[row for _, row in chunk])).scalars().all()
+            await _commit_detached(session, created)
+            result.items.extend(created)
+            continue
+        except ROW_ERRORS:
+            await session.rollback()
+        for index, row in chunk:
+            try:
+                created = (await session.exec(statement, params=[row])).scalars().all()
+                await _commit_detached(session, created)
+                result.items.extend(created)
+            except ROW_ERRORS as exc:
+                await session.rollback()
+                result.errors.append(BulkItemError(index=index, detail=_integrity_detail(exc)))
+    return result
+
+
+async def bulk_update(
+        session: Any, model: Any, updates: list[tuple[int, Any, dict[str, Any]]], extra: dict[str, Any] | None = None
+) -> BulkResult:
+    """Apply ``(index, id, data)`` updates, loading each chunk with a single SELECT ... IN.
+
+    Like ``bulk_insert``, a chunk that fails on one item's values is retried
+    item by item.
+    """
+    result = BulkResult()
+    for chunk in chunked(updates):
+        ids = [id for _, id, _ in chunk]
+        found = {obj.id: obj for obj in (await session.exec(select(model).where(model.id.in_(ids)))).all()}
+        touched = []
+        for index, id, data in chunk:
+            obj = found.get(id)
+            if obj is None:
+                result.errors.append(BulkItemError(index=index, detail="No encontrado"))
+                continue
+            obj.sqlmodel_update(data, update=extra or {})
+            session.add(obj)
+            touched.append((index, obj, data))
+        try:
+            await _commit_detached(session, [obj for _, obj, _ in touched])
+            result.items.extend(obj for _, obj, _ in touched)
+            continue
+        except ROW_ERRORS:
+            await session.rollback()
+        for index, obj, data in touched:
+            try:
+                # The rollback expired the object and dropped the chunk's changes
+                await session.refresh(obj)
+                obj.sqlmodel_update(data, update=extra or {})
+                session.add(obj)
+                await _commit_detached(session, [obj])
+                result.items.append(obj)
+            except ROW_ERRORS as exc:
+                await session.rollback()
+                result.errors.append(BulkItemError(index=index, detail=_integrity_detail(exc)))
+    return result
+
+
+async def bulk_delete(session: Any, model: Any, ids: list[Any]) -> BulkDeleteResult:
+    result = BulkDeleteResult()
+    for chunk in chunked(list(enumerate(ids))):
+        statement = delete(model).where(model.id.in_([id for _, id in chunk])).returning(model.id)
+        try:
+            deleted = set((await session.exec(statement)).scalars().all())
+            await session.commit()
+        except IntegrityError as exc:
+            await session.rollback()
+            detail = _integrity_detail(exc)
+            result.errors.extend(BulkItemError(index=index, detail=detail) for index, _ in chunk)
+            continue
+        for index, id in chunk:
+            if id in deleted:
+                result.deleted.append(id)
+                deleted.discard(id)
+            else:
+                result.errors.append(BulkItemError(index=index, detail="No encontrado"))
+    return result
+
+
+def with_errors(result: BulkResult | BulkDeleteResult, errors: list[BulkItemError]):
+    result.errors = sorted([*errors, *result.errors], key=lambda error: error.index)
+    return result
@@ -1,20 +1,87 @@
+import uuid
+from contextlib import asynccontextmanager
 from typing import Annotated
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
-from app.core.database import engine
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_async_engine, get_engine, SyncSessionAdapter
+from app.core.lookups import Lookups, lookups
 from app.core.security import SECRET_KEY, ALGORITHM
-from app.models import User, TokenData
+from app.models import RolEnum, User, TokenData, Principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/token")
 
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAXSIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+
+def invalidate_principal(user_id: uuid.UUID) -> None:
+    principal_cache.delete(user_id)
+
+
+async def get_async_session():
+    if settings.DB_ASYNC:
+        async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+            yield session
+    else:
+        with Session(get_engine(), expire_on_commit=False) as session:
+            yield SyncSessionAdapter(session)
+
+
+# Same sessions outside a request, e.g. for background jobs
+open_session = asynccontextmanager(get_async_session)
+
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+
+async def refresh_lookups() -> Lookups:
+    async with open_session() as session:
+        await lookups.load(session)
+    return lookups
+
+
+async def get_lookups() -> Lookups:
+    # Loaded by the lifespan; this covers apps started without it
+    if not lookups.loaded:
+        await refresh_lookups()
+    return lookups
+
+
+LookupsDep = Annotated[Lookups, Depends(get_lookups)]
+
+
+async def resolve_principal(session: AsyncSession, token_data: TokenData) -> Principal | None:
+    if token_data.user_id is not None:
+        principal = principal_cache.get(token_data.user_id)
+        if principal is not None:
+            return principal
+        user = await session.get(User, token_data.user_id)
+    else:
+        # Tokens issued before the uid claim existed only carry the email
+        user = await crud.get_user_by_email_async(session=session, email=token_data.username)
+    if user is None:
+        return None
+    principal = Principal.model_validate(user, from_attributes=True)
+    principal_cache.set(principal.id, principal)
+    return principal
+
+
+async def get_current_user(
+        request: Request, token: Annotated[str, Depends(oauth2_scheme)], session: AsyncSessionDep
+) -> Principal:
+    # Router-level and endpoint-level dependencies share the resolved user
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,39 +92,33 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         username = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except InvalidTokenError:
+        token_data = TokenData(username=username, user_id=payload.get("uid"))
+    except (InvalidTokenError, ValueError):
         raise credentials_exception
-    user = crud.get_user_by_email(session=Session(engine), email=token_data.username)
-    if user is None:
+    principal = await resolve_principal(session, token_data)
+    if principal is None:
         raise credentials_exception
-    return user
+    request.state.principal = principal
+    return principal
 
 
 async def get_current_active_user(
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)], registry: LookupsDep
 ):
-    if not current_user.estado != 1:
+    if not registry.is_active(current_user.estado_id):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-async def get_current_active_superuser(current_user: Annotated[User, Depends(get_current_user)]):
-    if not current_user.rol_id == 1 or current_user.estado == 2:
-        if current_user.estado == 2:
-            raise HTTPException(
-                status_code=403, detail="El usuario está inactivo"
-            )
-        else:
-            raise HTTPException(
-                status_code=403, detail="No tienes los previlegios para realizar esta acción"
-            )
+async def get_current_active_superuser(
+        current_user: Annotated[Principal, Depends(get_current_user)], registry: LookupsDep
+):
+    if not registry.is_active(current_user.estado_id):
+        raise HTTPException(
+            status_code=403, detail="El usuario está inactivo"
+        )
+    if not registry.has_rol(current_user.rol_id, RolEnum.ADMIN):
+        raise HTTPException(
+            status_code=403, detail="No tienes los previlegios para realizar esta acción"
+        )
     return current_user
-
-
-def get_session():
-    with Session(engine) as session:
-        yield session
-
-
-SessionDep = Annotated[Session, Depends(get_session)]
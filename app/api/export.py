@@ -0,0 +1,133 @@
+import csv
+import datetime
+import io
+import zlib
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Literal
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row
+from sqlmodel.sql.expression import Select
+
+from app.api.projection import Projection
+from app.core.config import settings
+from app.core.database import get_async_engine, get_engine
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def created_between(
+        statement: Select, model: Any, since: datetime.datetime | None, until: datetime.datetime | None
+) -> Select:
+    if since is not None:
+        statement = statement.where(model.created_date >= since)
+    if until is not None:
+        statement = statement.where(model.created_date < until)
+    return statement
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list | dict):
+        return orjson.dumps(value).decode()
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class ExportWriter:
+    """Encodes batches of projected rows as NDJSON or CSV, optionally gzipped.
+
+    Each batch is flushed through the compressor so the client receives data
+    as the rows are read instead of after the whole table.
+    """
+
+    def __init__(self, rows: Projection, format: ExportFormat, compress: bool):
+        if rows.nested:
+            raise ValueError("Exports only support flat projections")
+        self.rows = rows
+        self.format = format
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer, lineterminator="\n")
+        # wbits=31 writes a gzip container instead of a raw zlib stream
+        self._gzip = zlib.compressobj(wbits=31) if compress else None
+
+    def _encode(self, data: bytes) -> bytes:
+        if self._gzip is None:
+            return data
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def _drain_csv(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        if self.format == "csv":
+            self._csv.writerow(self.rows.fields)
+            return self._encode(self._drain_csv())
+        return b""
+
+    def write(self, batch: Sequence[Row]) -> bytes:
+        items = [self.rows.item(row) for row in batch]
+        if self.format == "ndjson":
+            return self._encode(b"".join(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE) for item in items))
+        self._csv.writerows([_csv_value(item[field]) for field in self.rows.fields] for item in items)
+        return self._encode(self._drain_csv())
+
+    def finish(self) -> bytes:
+        return self._gzip.flush() if self._gzip is not None else b""
+
+
+# The export streams from its own connection: yield_per turns into a server-side
+# cursor on Postgres, so memory stays at one batch whatever the table size
+
+
+def _sync_chunks(statement: Select, writer: ExportWriter) -> Iterator[bytes]:
+    yield writer.start()
+    with get_engine().connect() as connection:
+        result = connection.execution_options(yield_per=settings.EXPORT_BATCH_SIZE).execute(statement)
+        for batch in result.partitions():
+            yield writer.write(batch)
+    yield writer.finish()
+
+
+async def _async_chunks(statement: Select, writer: ExportWriter) -> AsyncIterator[bytes]:
+    yield writer.start()
+    async with get_async_engine().connect() as connection:
+        result = await connection.stream(statement.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            yield writer.write(batch)
+    yield writer.finish()
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def export_response(
+        request: Request, name: str, rows: Projection, statement: Select, format: ExportFormat
+) -> StreamingResponse:
+    """Stream ``statement`` in (created_date, id) order as ``name.csv``/``name.ndjson``."""
+    compress = _accepts_gzip(request)
+    writer = ExportWriter(rows, format, compress)
+    statement = statement.order_by(rows.model.created_date, rows.model.id)
+    chunks = _async_chunks(statement, writer) if settings.DB_ASYNC else _sync_chunks(statement, writer)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{format}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
@@ -0,0 +1,214 @@
+import csv
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import typing
+import uuid
+from collections.abc import Iterator
+from typing import Any, Literal
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlmodel import or_, select
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from app.api.bulk import BulkItemError, BulkResult, bulk_insert, reject_duplicates, table_rows, validate_items
+from app.api.deps import open_session
+from app.api.jobs import job_queue
+from app.api.response_cache import response_cache
+from app.core.config import settings
+from app.core.security import PasswordHashingBusy, hash_passwords_async
+from app.models import Guia, GuiaCreate, Job, User, UserCreate
+
+ImportKind = Literal["users", "guias"]
+
+
+class ImportReport(BaseModel):
+    """Progress and result of an import job."""
+    kind: ImportKind
+    # Progress through the uploaded file; the row count isn't known until the end
+    bytes_total: int = 0
+    bytes_read: int = 0
+    processed: int = 0
+    created: int = 0
+    failed: int = 0
+    # Per-row errors, ``index`` is the data row (0 = first row after the header), blank rows included
+    errors: list[BulkItemError] = []
+    errors_truncated: bool = False
+
+    def add_errors(self, errors: list[BulkItemError]) -> None:
+        self.failed += len(errors)
+        room = settings.IMPORT_MAX_ERRORS - len(self.errors)
+        self.errors.extend(errors[:max(room, 0)])
+        self.errors_truncated = self.errors_truncated or len(errors) > room
+
+
+async def insert_users(
+        session: Any, valid: list[tuple[int, UserCreate]], errors: list[BulkItemError]
+) -> BulkResult[User]:
+    emails = [user.email for _, user in valid]
+    cedulas = [user.cedula for _, user in valid]
+    existing = (await session.exec(
+        select(User.email, User.cedula).where(or_(User.email.in_(emails), User.cedula.in_(cedulas)))
+    )).all()
+    valid = reject_duplicates(valid, "email", {email for email, _ in existing}, "Este correo ya está en uso", errors)
+    valid = reject_duplicates(valid, "cedula", {cedula for _, cedula in existing}, "Esta cédula ya está en uso", errors)
+    passwords = {index: user.password for index, user in valid}
+    # Validated before hashing, so rejected rows don't cost a bcrypt round
+    rows = table_rows(User, valid, errors, hashed_password="")
+    hashed_passwords = await hash_passwords_async([passwords[index] for index, _ in rows])
+    for (_, row), hashed_password in zip(rows, hashed_passwords):
+        row["hashed_password"] = hashed_password
+    return await bulk_insert(session, User, rows)
+
+
+async def insert_guias(
+        session: Any, valid: list[tuple[int, GuiaCreate]], errors: list[BulkItemError], created_by: uuid.UUID
+) -> BulkResult[Guia]:
+    usuarios = [guia.id_usuario for _, guia in valid if guia.id_usuario is not None]
+    taken = set((await session.exec(select(Guia.id_usuario).where(Guia.id_usuario.in_(usuarios)))).all())
+    valid = reject_duplicates(valid, "id_usuario", taken, "El usuario ya es guia", errors)
+    rows = table_rows(Guia, valid, errors, id_usuario_created=created_by)
+    result = await bulk_insert(session, Guia, rows)
+    await response_cache.invalidate("guia")
+    return result
+
+
+SCHEMAS: dict[ImportKind, type[BaseModel]] = {"users": UserCreate, "guias": GuiaCreate}
+
+
+def _is_list(annotation: Any) -> bool:
+    return typing.get_origin(annotation) is list or any(_is_list(arg) for arg in typing.get_args(annotation))
+
+
+def _split_list(value: str) -> Any:
+    # Our own exports write JSON arrays; spreadsheets usually separate by commas
+    if value.startswith("["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return [item.strip() for item in value.replace(";", ",").replace("|", ",").split(",") if item.strip()]
+
+
+class CSVRows:
+    """Reads an uploaded CSV one line at a time as ``(index, row)`` dicts for ``schema``.
+
+    Lines are UTF-8, or cp1252 as spreadsheets in es locales save them; a row
+    with a line in neither becomes an error in ``errors``. Empty cells are
+    dropped so the schema defaults apply, and list fields accept JSON arrays
+    or comma separated values.
+    """
+
+    def __init__(self, path: str, schema: type[BaseModel], report: ImportReport):
+        self.path = path
+        self.list_fields = {name for name, field in schema.model_fields.items() if _is_list(field.annotation)}
+        self.report = report
+        self.errors: list[BulkItemError] = []
+        # Line numbers, as csv.reader counts them, that couldn't be decoded
+        self._undecodable: list[int] = []
+
+    def _lines(self, file: typing.BinaryIO) -> Iterator[str]:
+        for number, line in enumerate(file, 1):
+            self.report.bytes_read += len(line)
+            if number == 1:
+                # Excel prefixes UTF-8 CSVs with a byte order mark
+                line = line.removeprefix(b"\xef\xbb\xbf")
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError:
+                try:
+                    yield line.decode("cp1252")
+                except UnicodeDecodeError:
+                    self._undecodable.append(number)
+                    yield line.decode("cp1252", errors="replace")
+
+    def __iter__(self) -> Iterator[tuple[int, dict[str, Any]]]:
+        with open(self.path, "rb") as file:
+            lines = self._lines(file)
+            header = next(lines, "")
+            # Spreadsheets in es locales save with ";" separators
+            delimiter = ";" if header.count(";") > header.count(",") else ","
+            reader = csv.reader(itertools.chain([header], lines), delimiter=delimiter)
+            columns = [column.strip().lower() for column in next(reader, [])]
+            self._undecodable.clear()
+            for index, values in enumerate(reader):
+                if self._undecodable and self._undecodable[-1] <= reader.line_num:
+                    self._undecodable.clear()
+                    self.errors.append(BulkItemError(index=index, detail="La fila no está en UTF-8 ni en cp1252"))
+                    continue
+                if not any(value.strip() for value in values):
+                    continue
+                row = {}
+                for column, value in zip(columns, values):
+                    value = value.strip()
+                    if value:
+                        row[column] = _split_list(value) if column in self.list_fields else value
+                yield index, row
+
+
+async def spool_upload(upload: UploadFile) -> tuple[str, int]:
+    """Copy the upload to a temporary file the job owns, since the request closes
+    its UploadFile once the response is sent."""
+    with tempfile.NamedTemporaryFile(prefix="import-", suffix=".csv", delete=False) as file:
+        await run_in_threadpool(shutil.copyfileobj, upload.file, file, 1024 * 1024)
+        return file.name, file.tell()
+
+
+async def _insert_users_retrying(
+        session: Any, valid: list[tuple[int, UserCreate]], errors: list[BulkItemError]
+) -> BulkResult[User]:
+    """insert_users, waiting for the bcrypt pool when a burst of logins saturates it
+    instead of failing the rest of the import."""
+    retrying = AsyncRetrying(
+        stop=stop_after_attempt(settings.JOBS_MAX_ATTEMPTS),
+        wait=wait_exponential(multiplier=settings.JOBS_RETRY_BACKOFF_SECONDS, max=60),
+        retry=retry_if_exception_type(PasswordHashingBusy),
+        reraise=True,
+    )
+    async for attempt in retrying:
+        with attempt:
+            # insert_users appends its rejections, so each attempt starts from the same errors
+            attempt_errors = list(errors)
+            result = await insert_users(session, valid, attempt_errors)
+    errors[:] = attempt_errors
+    return result
+
+
+# Local: the upload is on this worker's disk. One at a time, since imports share the bcrypt pool.
+@job_queue.task("import_csv", local=True, concurrency=1)
+async def run_import(job: Job, kind: ImportKind, path: str, bytes_total: int, created_by: str) -> dict[str, Any]:
+    """Validate and insert the file in BULK_CHUNK_SIZE batches, one commit each."""
+    schema = SCHEMAS[kind]
+    report = ImportReport(kind=kind, bytes_total=bytes_total)
+    try:
+        csv_rows = CSVRows(path, schema, report)
+        rows = iter(csv_rows)
+        async with open_session() as session:
+            while True:
+                # File reads and CSV parsing stay off the event loop
+                batch = await run_in_threadpool(lambda: list(itertools.islice(rows, settings.BULK_CHUNK_SIZE)))
+                if not batch and not csv_rows.errors:
+                    break
+                valid, errors = validate_items([row for _, row in batch], schema, (index for index, _ in batch))
+                report.processed += len(batch) + len(csv_rows.errors)
+                errors.extend(csv_rows.errors)
+                csv_rows.errors.clear()
+                if kind == "users":
+                    result = await _insert_users_retrying(session, valid, errors)
+                else:
+                    result = await insert_guias(session, valid, errors, uuid.UUID(created_by))
+                report.created += len(result.items)
+                report.add_errors(sorted([*errors, *result.errors], key=lambda error: error.index))
+                await job_queue.update_progress(job, report.model_dump(mode="json"))
+    finally:
+        os.unlink(path)
+    return report.model_dump(mode="json")
+
+
+async def start_import(kind: ImportKind, upload: UploadFile, created_by: uuid.UUID) -> Job:
+    path, size = await spool_upload(upload)
+    return await job_queue.enqueue("import_csv", kind=kind, path=path, bytes_total=size, created_by=str(created_by))
@@ -0,0 +1,396 @@
+import asyncio
+import collections
+import datetime
+import logging
+import uuid
+from collections.abc import Awaitable, Callable, Collection
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select, update
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from app.api.deps import open_session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.emails import EmailNotSent, new_account_email, send_email
+from app.models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class Task:
+    name: str
+    handler: Handler
+    max_attempts: int
+    retry_on: tuple[type[Exception], ...]
+    concurrency: int | None
+    local: bool
+
+
+class JobBackend(Protocol):
+    async def put(self, job: Job) -> None: ...
+
+    async def claim(self, names: Collection[str]) -> Job | None: ...
+
+    async def save(self, job: Job) -> None: ...
+
+    async def get(self, id: uuid.UUID) -> Job | None: ...
+
+    async def recent(self, status: JobStatus | None, limit: int) -> list[Job]: ...
+
+    async def requeue_stale(self, started_before: datetime.datetime, local: Collection[str]) -> int: ...
+
+
+class MemoryJobBackend:
+    """Jobs of this worker process; finished ones are kept for JOBS_TTL_SECONDS."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.jobs = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.queued: collections.deque[Job] = collections.deque()
+
+    async def put(self, job: Job) -> None:
+        self.jobs.set(job.id, job)
+        self.queued.append(job)
+
+    async def claim(self, names: Collection[str]) -> Job | None:
+        for job in self.queued:
+            if job.name in names:
+                self.queued.remove(job)
+                job.status = JobStatus.RUNNING
+                job.started_date = datetime.datetime.now()
+                return job
+        return None
+
+    async def save(self, job: Job) -> None:
+        # The job is updated in place; setting it again only refreshes its TTL
+        self.jobs.set(job.id, job)
+
+    async def get(self, id: uuid.UUID) -> Job | None:
+        return self.jobs.get(id)
+
+    async def recent(self, status: JobStatus | None, limit: int) -> list[Job]:
+        jobs = [job for job in self.jobs.values() if status is None or job.status == status]
+        return sorted(jobs, key=lambda job: job.created_date, reverse=True)[:limit]
+
+    async def requeue_stale(self, started_before: datetime.datetime, local: Collection[str]) -> int:
+        # Running jobs of this process can't outlive it
+        return 0
+
+
+class DatabaseJobBackend:
+    """Jobs in the ``job`` table, shared by every worker process.
+
+    Workers poll for queued rows and claim them with FOR UPDATE SKIP LOCKED,
+    so each job runs once even with many workers polling. A worker that dies
+    after claiming leaves its job RUNNING until ``requeue_stale`` queues it
+    again.
+    """
+
+    async def put(self, job: Job) -> None:
+        async with open_session() as session:
+            session.add(job)
+            await session.commit()
+
+    async def claim(self, names: Collection[str]) -> Job | None:
+        if not names:
+            return None
+        async with open_session() as session:
+            statement = (
+                select(Job)
+                .where(Job.status == JobStatus.QUEUED, Job.name.in_(names))
+                .order_by(Job.created_date)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = (await session.exec(statement)).first()
+            if job is None:
+                return None
+            job.status = JobStatus.RUNNING
+            job.started_date = datetime.datetime.now()
+            session.add(job)
+            await session.commit()
+            return job
+
+    async def save(self, job: Job) -> None:
+        async with open_session() as session:
+            await session.exec(update(Job).where(Job.id == job.id).values(
+                status=job.status,
+                attempts=job.attempts,
+                progress=job.progress,
+                result=job.result,
+                error=job.error,
+                started_date=job.started_date,
+                finished_date=job.finished_date,
+            ))
+            await session.commit()
+
+    async def get(self, id: uuid.UUID) -> Job | None:
+        async with open_session() as session:
+            return await session.get(Job, id)
+
+    async def recent(self, status: JobStatus | None, limit: int) -> list[Job]:
+        statement = select(Job).order_by(Job.created_date.desc()).limit(limit)
+        if status is not None:
+            statement = statement.where(Job.status == status)
+        async with open_session() as session:
+            return list((await session.exec(statement)).all())
+
+    async def requeue_stale(self, started_before: datetime.datetime, local: Collection[str]) -> int:
+        """Queue stale jobs again, except ``local`` ones: their worker is gone, so they fail."""
+        stale = (Job.status == JobStatus.RUNNING, Job.started_date < started_before)
+        async with open_session() as session:
+            requeued = await session.exec(
+                update(Job)
+                .where(*stale, Job.name.not_in(local))
+                .values(status=JobStatus.QUEUED, started_date=None)
+            )
+            failed = await session.exec(
+                update(Job)
+                .where(*stale, Job.name.in_(local))
+                .values(status=JobStatus.FAILED, error="Interrumpido, su servidor se detuvo",
+                        finished_date=datetime.datetime.now())
+            )
+            await session.commit()
+            return requeued.rowcount + failed.rowcount
+
+
+class MirroredJobBackend:
+    """Local jobs with a persistent backend: queued and claimed in this worker's
+    memory, but every write is copied to the ``job`` table so any worker can
+    answer ``GET /jobs`` for them.
+
+    The persistent dispatchers never claim local task names, so the rows are
+    only read elsewhere.
+    """
+
+    def __init__(self, memory: MemoryJobBackend, persistent: JobBackend):
+        self.memory = memory
+        self.persistent = persistent
+
+    async def put(self, job: Job) -> None:
+        await self.persistent.put(job)
+        await self.memory.put(job)
+
+    async def claim(self, names: Collection[str]) -> Job | None:
+        job = await self.memory.claim(names)
+        if job is not None:
+            await self.persistent.save(job)
+        return job
+
+    async def save(self, job: Job) -> None:
+        await self.memory.save(job)
+        await self.persistent.save(job)
+
+    async def get(self, id: uuid.UUID) -> Job | None:
+        return await self.memory.get(id) or await self.persistent.get(id)
+
+    async def recent(self, status: JobStatus | None, limit: int) -> list[Job]:
+        return await self.persistent.recent(status, limit)
+
+    async def requeue_stale(self, started_before: datetime.datetime, local: Collection[str]) -> int:
+        return await self.memory.requeue_stale(started_before, local)
+
+
+class JobQueue:
+    """Runs registered tasks in the background of the worker's event loop.
+
+    At most ``concurrency`` jobs run at once per worker, plus an optional
+    limit per task. Failed attempts are retried with exponential backoff
+    for the exceptions the task lists in ``retry_on``.
+
+    Local tasks always run in the worker that enqueued them, even with a
+    persistent backend, e.g. imports whose upload sits on this worker's disk;
+    their rows and progress are still written to the persistent backend, so
+    any worker can report on them. Persistent jobs cancelled by a shutdown go
+    back to the queue for another worker; local ones fail, since their worker
+    is going away.
+    """
+
+    def __init__(self, persistent: JobBackend | None, concurrency: int, poll_interval: float):
+        self.memory = MemoryJobBackend(maxsize=settings.JOBS_MAXSIZE, ttl=settings.JOBS_TTL_SECONDS)
+        self.persistent = persistent
+        self.local = self.memory if persistent is None else MirroredJobBackend(self.memory, persistent)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.tasks: dict[str, Task] = {}
+        self.active = 0
+        self.active_by_task: collections.Counter[str] = collections.Counter()
+        self.succeeded = 0
+        self.failed = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._dispatchers: list[asyncio.Task] = []
+        self._reaper: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def task(
+            self, name: str, *, max_attempts: int = 1, retry_on: tuple[type[Exception], ...] = (Exception,),
+            concurrency: int | None = None, local: bool = False
+    ) -> Callable[[Handler], Handler]:
+        """Register ``handler(job, **payload)`` to run jobs enqueued as ``name``."""
+        def register(handler: Handler) -> Handler:
+            self.tasks[name] = Task(name, handler, max_attempts, retry_on, concurrency, local)
+            return handler
+        return register
+
+    def _backend(self, task: Task) -> JobBackend:
+        return self.local if task.local or self.persistent is None else self.persistent
+
+    async def enqueue(self, name: str, **payload: Any) -> Job:
+        """Queue a job; the payload must be JSON serializable for the database backend."""
+        task = self.tasks[name]
+        job = Job(name=name, payload=payload)
+        await self._backend(task).put(job)
+        self.start()
+        self._wakeup.set()
+        return job
+
+    async def update_progress(self, job: Job, progress: dict[str, Any]) -> None:
+        job.progress = progress
+        await self._backend(self.tasks[job.name]).save(job)
+
+    # With a persistent backend every job has a row, local ones included
+
+    async def get(self, id: uuid.UUID) -> Job | None:
+        return await self.local.get(id)
+
+    async def recent(self, status: JobStatus | None = None, limit: int = 50) -> list[Job]:
+        return await self.local.recent(status, limit)
+
+    def _available(self, backend: JobBackend) -> list[str]:
+        return [
+            name for name, task in self.tasks.items()
+            if self._backend(task) is backend
+            and (task.concurrency is None or self.active_by_task[name] < task.concurrency)
+        ]
+
+    def _local_names(self) -> list[str]:
+        return [name for name, task in self.tasks.items() if task.local]
+
+    async def _dispatch(self, backend: JobBackend) -> None:
+        while True:
+            # Cleared before claiming so an enqueue racing the claim still wakes us up
+            self._wakeup.clear()
+            job = None
+            if self.active < self.concurrency:
+                try:
+                    job = await backend.claim(self._available(backend))
+                except Exception:
+                    logger.exception("Claiming a job failed")
+            if job is None:
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                continue
+            self.active += 1
+            self.active_by_task[job.name] += 1
+            running = asyncio.create_task(self._run(backend, job))
+            self._running.add(running)
+            running.add_done_callback(lambda _, name=job.name: self._finished(name))
+            running.add_done_callback(self._running.discard)
+
+    def _finished(self, name: str) -> None:
+        self.active -= 1
+        self.active_by_task[name] -= 1
+        self._wakeup.set()
+
+    async def _run(self, backend: JobBackend, job: Job) -> None:
+        task = self.tasks[job.name]
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(task.max_attempts),
+            wait=wait_exponential(multiplier=settings.JOBS_RETRY_BACKOFF_SECONDS, max=60),
+            retry=retry_if_exception_type(task.retry_on),
+            reraise=True,
+        )
+        try:
+            async for attempt in retrying:
+                with attempt:
+                    job.attempts += 1
+                    job.result = await task.handler(job, **job.payload)
+            job.status = JobStatus.SUCCEEDED
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            if backend is self.persistent:
+                job.status = JobStatus.QUEUED
+                job.started_date = None
+            else:
+                job.status = JobStatus.FAILED
+                job.error = "Cancelado al detener el servidor"
+                self.failed += 1
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.name)
+            job.status = JobStatus.FAILED
+            job.error = f"{type(exc).__name__}: {exc}"
+            self.failed += 1
+        finally:
+            if job.status != JobStatus.QUEUED:
+                job.finished_date = datetime.datetime.now()
+            await backend.save(job)
+
+    async def _reap(self, backend: JobBackend) -> None:
+        while True:
+            started_before = datetime.datetime.now() - datetime.timedelta(seconds=settings.JOBS_STALE_AFTER_SECONDS)
+            try:
+                recovered = await backend.requeue_stale(started_before, self._local_names())
+                if recovered:
+                    logger.warning("Recovered %d jobs still running since before %s", recovered, started_before)
+            except Exception:
+                logger.exception("Recovering stale jobs failed")
+            await asyncio.sleep(settings.JOBS_REAP_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        """Start the dispatchers on the running loop; a no-op once started."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        backends = [self.local] if self.persistent is None else [self.local, self.persistent]
+        self._dispatchers = [asyncio.create_task(self._dispatch(backend)) for backend in backends]
+        if self.persistent is not None:
+            self._reaper = asyncio.create_task(self._reap(self.persistent))
+
+    async def stop(self, timeout: float) -> None:
+        """Stop claiming jobs, give the running ones ``timeout`` seconds, then cancel them."""
+        background = [*self._dispatchers, *([self._reaper] if self._reaper is not None else [])]
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        self._dispatchers = []
+        self._reaper = None
+        self._loop = None
+        if self._running:
+            _, pending = await asyncio.wait(self._running, timeout=timeout)
+            for running in pending:
+                running.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "backend": settings.JOBS_BACKEND,
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued_local": len(self.memory.queued),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
+
+
+job_queue = JobQueue(
+    DatabaseJobBackend() if settings.JOBS_BACKEND == "database" else None,
+    concurrency=settings.JOBS_CONCURRENCY,
+    poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+)
+
+
+# SMTP errors derive from OSError, like connection failures
+@job_queue.task("new_account_email", max_attempts=settings.JOBS_MAX_ATTEMPTS, retry_on=(EmailNotSent, OSError))
+async def send_new_account_email(job: Job, email_to: str, nombre: str | None) -> None:
+    subject, html_content = new_account_email(email_to=email_to, nombre=nombre)
+    await run_in_threadpool(send_email, email_to=email_to, subject=subject, html_content=html_content)
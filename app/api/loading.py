@@ -0,0 +1,27 @@
+from functools import lru_cache
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
+
+
+@lru_cache
+def load_options(model: Any, response_model: type[BaseModel]) -> tuple[LoaderOption, ...]:
+    """Loader options that populate every relationship ``response_model`` serializes.
+
+    Many-to-one relationships are joined into the same statement, collections are
+    fetched with one extra IN query, and anything else raises instead of lazy
+    loading, so a page costs a fixed number of statements whatever its size.
+    """
+    relationships = inspect(model).relationships
+    options: list[LoaderOption] = []
+    for name in response_model.model_fields:
+        relationship = relationships.get(name)
+        if relationship is None:
+            continue
+        attribute = getattr(model, name)
+        options.append(selectinload(attribute) if relationship.uselist else joinedload(attribute))
+    options.append(raiseload("*"))
+    return tuple(options)
@@ -1,9 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.routes import login, users, operadora, guia
+from app.api.routes import login, users, operadora, guia, jobs, lookups, metrics
 
 api_router = APIRouter()
 api_router.include_router(login.router)
 api_router.include_router(users.router)
 api_router.include_router(operadora.router)
-api_router.include_router(guia.router)
\ No newline at end of file
+api_router.include_router(guia.router)
+api_router.include_router(jobs.router)
+api_router.include_router(lookups.router)
+api_router.include_router(metrics.router)
\ No newline at end of file
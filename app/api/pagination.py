@@ -0,0 +1,55 @@
+import base64
+import datetime
+import json
+from typing import Any, Generic, Literal, TypeVar
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlmodel.sql.expression import Select, SelectOfScalar
+
+T = TypeVar("T")
+
+PaginationMode = Literal["offset", "cursor"]
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
+
+
+def encode_cursor(created_date: datetime.datetime, id: Any) -> str:
+    raw = json.dumps([created_date.isoformat(), str(id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, model: Any) -> tuple[datetime.datetime, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_date, id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_date), model.id.type.python_type(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def wants_cursor(pagination: PaginationMode, cursor: str | None) -> bool:
+    return pagination == "cursor" or cursor is not None
+
+
+async def keyset_page(
+        session: Any, statement: Select | SelectOfScalar, model: Any, cursor: str | None, limit: int
+) -> dict[str, Any]:
+    """Run ``statement`` as a (created_date, id) keyset page.
+
+    The ordering matches the ``ix_<table>_created_date_id`` indexes, so deep pages
+    seek straight to the cursor instead of scanning the skipped rows.
+    """
+    statement = statement.order_by(model.created_date, model.id)
+    if cursor is not None:
+        statement = statement.where(tuple_(model.created_date, model.id) > decode_cursor(cursor, model))
+    rows = (await session.exec(statement.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_date, rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,121 @@
+import types
+import typing
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import Row, inspect
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.sql.expression import Select
+
+from app.api.responses import Payload, Validators
+
+# Always selected: cursors and validators need them even when the response doesn't
+VERSION_COLUMNS = ("id", "created_date", "updated_date")
+
+
+def _nested_model(annotation: Any) -> type[BaseModel]:
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+    return annotation
+
+
+class Projection:
+    """Selects only the columns ``response_model`` serializes and builds plain
+    dicts from the row tuples, skipping ORM instances and response validation.
+
+    Many-to-one relationships in the response model are outer joined and
+    nested under their field name.
+    """
+
+    def __init__(self, model: Any, response_model: type[BaseModel], fields: tuple[str, ...] | None = None):
+        self.model = model
+        # Part of the validators, so each field subset gets its own ETag
+        self.sparse_fields = fields
+        mapper = inspect(model)
+        self.fields: list[str] = []
+        self.nested: list[tuple[str, list[str]]] = []
+        columns = []
+        joins = []
+        for name, field in response_model.model_fields.items():
+            if fields is not None and name not in fields:
+                continue
+            if name in mapper.columns:
+                self.fields.append(name)
+                columns.append(getattr(model, name).label(name))
+                continue
+            relationship = mapper.relationships.get(name)
+            if relationship is None or relationship.uselist:
+                raise ValueError(f"{response_model.__name__}.{name} can't be projected from {model.__name__}")
+            target = aliased(relationship.mapper.class_, name=name)
+            nested_fields = list(_nested_model(field.annotation).model_fields)
+            self.nested.append((name, nested_fields))
+            for nested_field in dict.fromkeys([*nested_fields, *VERSION_COLUMNS]):
+                columns.append(getattr(target, nested_field).label(f"{name}__{nested_field}"))
+            joins.append((target, getattr(model, name).of_type(target)))
+        columns.extend(getattr(model, name).label(name) for name in VERSION_COLUMNS if name not in self.fields)
+        statement = select(*columns).select_from(model)
+        for target, onclause in joins:
+            statement = statement.outerjoin(target, onclause)
+        self._statement = statement
+
+    def statement(self) -> Select:
+        return self._statement
+
+    def item(self, row: Row) -> dict[str, Any]:
+        mapping = row._mapping
+        item = {name: mapping[name] for name in self.fields}
+        for name, nested_fields in self.nested:
+            if mapping[f"{name}__id"] is None:
+                item[name] = None
+            else:
+                item[name] = {field: mapping[f"{name}__{field}"] for field in nested_fields}
+        return item
+
+    def versions(self, row: Row) -> list[tuple[Any, Any]]:
+        """Same (id, version) pairs Validators derives from the equivalent ORM rows."""
+        mapping = row._mapping
+        versions = [(mapping["id"], mapping["updated_date"] or mapping["created_date"])]
+        for name, _ in self.nested:
+            if mapping[f"{name}__id"] is not None:
+                versions.append(
+                    (mapping[f"{name}__id"], mapping[f"{name}__updated_date"] or mapping[f"{name}__created_date"])
+                )
+        return versions
+
+    def one(self, row: Row) -> Payload:
+        return Payload(
+            validators=Validators.from_versions(self.versions(row), self.sparse_fields),
+            render=lambda: orjson.dumps(self.item(row)),
+        )
+
+    def many(self, content: list[Row] | dict[str, Any]) -> Payload:
+        """Payload for a plain list of rows or a keyset page dict."""
+        if isinstance(content, dict):
+            rows, next_cursor = content["items"], content["next_cursor"]
+            render = lambda: orjson.dumps({"items": [self.item(row) for row in rows], "next_cursor": next_cursor})
+        else:
+            rows, next_cursor = content, None
+            render = lambda: orjson.dumps([self.item(row) for row in rows])
+        versions = [version for row in rows for version in self.versions(row)]
+        return Payload(validators=Validators.from_versions(versions, (next_cursor, self.sparse_fields)), render=render)
+
+
+@lru_cache(maxsize=256)
+def projection(model: Any, response_model: type[BaseModel], fields: tuple[str, ...] | None = None) -> Projection:
+    return Projection(model, response_model, fields)
+
+
+def sparse_fields(fields: str | None, response_model: type[BaseModel]) -> tuple[str, ...] | None:
+    """Parse a ``fields=a,b`` query parameter into response-model order, so equal
+    field sets share one cached Projection."""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - response_model.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    return tuple(name for name in response_model.model_fields if name in requested)
@@ -0,0 +1,112 @@
+import datetime
+import uuid
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from sqlmodel import select
+
+from app.api.responses import Payload, Validators, json_response, not_modified_response
+from app.core.cache import CacheBackend, MemoryBackend, RedisBackend
+from app.core.config import settings
+from app.models import Guia
+
+
+def _pack(validators: Validators, body: bytes) -> bytes:
+    last_modified = validators.last_modified.isoformat() if validators.last_modified else ""
+    return f"{validators.etag}\n{last_modified}\n".encode() + body
+
+
+def _unpack(entry: bytes) -> tuple[Validators, bytes]:
+    etag, last_modified, body = entry.split(b"\n", 2)
+    modified = datetime.datetime.fromisoformat(last_modified.decode()) if last_modified else None
+    return Validators(etag=etag.decode(), last_modified=modified), body
+
+
+class ResponseCache:
+    """Read-through cache of serialized GET responses, keyed by namespace and params.
+
+    Entries keep the response validators next to the body, so a hit can still
+    answer a conditional request with 304.
+
+    Writes call ``invalidate``: detail entries are deleted by id and every list
+    page of the namespace is dropped at once by bumping its generation. A read
+    racing a write can still store the old row, for at most the TTL.
+    """
+
+    def __init__(self, backend: CacheBackend | None, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def item_key(namespace: str, id: Any) -> str:
+        return f"response:{namespace}:item:{id}"
+
+    async def list_key(self, namespace: str, request: Request) -> str:
+        generation = (await self.backend.get(f"response:{namespace}:generation") or b"0").decode()
+        params = urlencode(sorted(request.query_params.multi_items()))
+        # Different routes can list the same namespace, e.g. /guia and /operadora/{id}/guias
+        return f"response:{namespace}:list:{generation}:{request.url.path}?{params}"
+
+    async def respond(self, request: Request, key: str | None, load: Callable[[], Awaitable[Payload]]) -> Response:
+        cached = self.backend is not None and key is not None
+        if cached:
+            entry = await self.backend.get(key)
+            if entry is not None:
+                self.hits += 1
+                validators, body = _unpack(entry)
+                if validators.not_modified(request):
+                    return not_modified_response(validators)
+                return json_response(body, validators, {"X-Cache": "HIT"})
+            self.misses += 1
+        payload = await load()
+        validators = payload.validators
+        if validators.not_modified(request):
+            return not_modified_response(validators)
+        body = payload.render()
+        if not cached:
+            return json_response(body, validators)
+        await self.backend.set(key, _pack(validators, body), self.ttl)
+        return json_response(body, validators, {"X-Cache": "MISS"})
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+    async def invalidate(self, namespace: str, ids: Iterable[Any] = ()) -> None:
+        if self.backend is None:
+            return
+        await self.backend.delete(*(self.item_key(namespace, id) for id in ids))
+        await self.backend.incr(f"response:{namespace}:generation")
+
+
+def _backend() -> CacheBackend | None:
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    if settings.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryBackend(maxsize=settings.RESPONSE_CACHE_MAXSIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+    return None
+
+
+response_cache = ResponseCache(_backend(), ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+async def cached_list(request: Request, namespace: str, load: Callable[[], Awaitable[Payload]]) -> Response:
+    key = await response_cache.list_key(namespace, request) if response_cache.backend is not None else None
+    return await response_cache.respond(request, key, load)
+
+
+async def cached_item(request: Request, namespace: str, id: Any, load: Callable[[], Awaitable[Payload]]) -> Response:
+    return await response_cache.respond(request, response_cache.item_key(namespace, id), load)
+
+
+async def invalidate_user_guias(session: Any, user_ids: Iterable[uuid.UUID]) -> None:
+    # GuiaWithUser embeds the guia's usuario, so user edits stale those responses
+    user_ids = list(user_ids)
+    if response_cache.backend is None or not user_ids:
+        return
+    guia_ids = (await session.exec(select(Guia.id).where(Guia.id_usuario.in_(user_ids)))).all()
+    await response_cache.invalidate("guia", guia_ids)
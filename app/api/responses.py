@@ -0,0 +1,134 @@
+import datetime
+import hashlib
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import inspect
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson, which handles datetime and UUID natively."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+_adapters: dict[Any, TypeAdapter] = {}
+
+
+def precompile(*response_models: Any) -> None:
+    """Build the TypeAdapters at import time instead of on the first request."""
+    for response_model in response_models:
+        if response_model not in _adapters:
+            _adapters[response_model] = TypeAdapter(response_model)
+
+
+def serialize(response_model: Any, content: Any) -> bytes:
+    precompile(response_model)
+    adapter = _adapters[response_model]
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def _row_versions(obj: Any) -> list[tuple[Any, datetime.datetime]]:
+    """(id, updated_date or created_date) of a row and of the relationships loaded with it."""
+    rows = [obj]
+    state = inspect(obj)
+    for relationship in state.mapper.relationships:
+        # Only what the query already loaded: raiseload forbids touching the rest
+        related = state.dict.get(relationship.key)
+        if related is not None:
+            rows.extend(related if isinstance(related, list) else [related])
+    return [(row.id, row.updated_date or row.created_date) for row in rows]
+
+
+def _http_date(value: datetime.datetime) -> str:
+    # created_date/updated_date are naive local times
+    return format_datetime(value.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+@dataclass
+class Validators:
+    etag: str
+    last_modified: datetime.datetime | None
+
+    @classmethod
+    def from_versions(cls, versions: list[tuple[Any, datetime.datetime]], extra: Any = None) -> "Validators":
+        digest = hashlib.blake2b(repr((versions, extra)).encode(), digest_size=12).hexdigest()
+        last_modified = max((modified for _, modified in versions), default=None)
+        return cls(etag=f'"{digest}"', last_modified=last_modified)
+
+    @classmethod
+    def from_content(cls, content: Any) -> "Validators":
+        """ETag/Last-Modified from the row versions of an object, a list or a Page dict."""
+        extra = None
+        if isinstance(content, dict):
+            rows, extra = content["items"], content.get("next_cursor")
+        elif isinstance(content, Sequence):
+            rows = content
+        else:
+            rows = [content]
+        return cls.from_versions([version for row in rows for version in _row_versions(row)], extra)
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = _http_date(self.last_modified)
+        return headers
+
+    def not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        last_modified = self.last_modified.astimezone(datetime.timezone.utc).replace(microsecond=0)
+        return last_modified <= since
+
+
+@dataclass
+class Payload:
+    """A response body that is only rendered once the validators didn't match."""
+    validators: Validators
+    render: Callable[[], bytes]
+
+    @classmethod
+    def from_orm(cls, response_model: Any, content: Any) -> "Payload":
+        return cls(Validators.from_content(content), lambda: serialize(response_model, content))
+
+
+def json_response(body: bytes, validators: Validators, headers: dict[str, str] | None = None) -> Response:
+    return Response(content=body, media_type="application/json", headers={**validators.headers(), **(headers or {})})
+
+
+def not_modified_response(validators: Validators) -> Response:
+    return Response(status_code=304, headers=validators.headers())
+
+
+def conditional_response(request: Request, payload: Payload) -> Response:
+    """304 when the client's validators still match, otherwise the rendered body."""
+    if payload.validators.not_modified(request):
+        return not_modified_response(payload.validators)
+    return json_response(payload.render(), payload.validators)
+
+
+def check_if_match(request: Request, obj: Any) -> None:
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return
+    tags = [tag.strip() for tag in if_match.split(",")]
+    if "*" not in tags and Validators.from_content(obj).etag not in tags:
+        raise HTTPException(status_code=412, detail="El recurso fue modificado por otra petición")
@@ -1,14 +1,25 @@
 import datetime
-from typing import Annotated
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException, Query, Depends
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from sqlmodel import select
+from fastapi import APIRouter, Body, HTTPException, Query, Depends, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel.sql.expression import Select
 
-from app.api.deps import SessionDep
+from app.api.bulk import (
+    BulkDeleteResult, BulkResult, bulk_delete, bulk_update, validate_items, with_errors
+)
+from app.api.deps import AsyncSessionDep
 from app.api.deps import get_current_active_superuser
-from app.models import Guia, GuiaCreate, User, GuiaWithUser, GuiaUpdate
+from app.api.export import ExportFormat, created_between, export_response
+from app.api.imports import insert_guias, start_import
+from app.api.loading import load_options
+from app.api.pagination import Page, PaginationMode, keyset_page, wants_cursor
+from app.api.projection import projection, sparse_fields
+from app.api.response_cache import cached_item, cached_list, response_cache
+from app.api.responses import ORJSONResponse, check_if_match
+from app.api.search import json_array_contains
+from app.core.config import settings
+from app.models import Guia, GuiaCreate, Job, Principal, GuiaWithUser, GuiaUpdate, GuiaBulkUpdate
 
 router = APIRouter(tags=["guia"], dependencies=[Depends(get_current_active_superuser)])
 
@@ -16,47 +27,142 @@ router = APIRouter(tags=["guia"], dependencies=[Depends(get_current_active_super
 @router.post("/guia", response_model=Guia)
 async def add_guia(
         guia_in: GuiaCreate,
-        session: SessionDep,
-        current_user: User = Depends(get_current_active_superuser)
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
 ):
     guia = Guia.model_validate(guia_in, update={"id_usuario_created": current_user.id})
     session.add(guia)
-    session.commit()
-    session.refresh(guia)
+    await session.commit()
+    await session.refresh(guia)
+    await response_cache.invalidate("guia")
     return guia
 
 
-@router.get("/guia", response_model=list[GuiaWithUser])
+@router.post("/guia/bulk", response_model=BulkResult[Guia])
+async def add_guias_bulk(
+        items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)],
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
+):
+    valid, errors = validate_items(items, GuiaCreate)
+    return with_errors(await insert_guias(session, valid, errors, current_user.id), errors)
+
+
+@router.post("/guia/import", response_model=Job, status_code=202)
+async def import_guias(
+        file: UploadFile,
+        current_user: Principal = Depends(get_current_active_superuser)
+):
+    return await start_import("guias", file, current_user.id)
+
+
+@router.patch("/guia/bulk", response_model=BulkResult[Guia])
+async def update_guias_bulk(
+        items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)],
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
+):
+    valid, errors = validate_items(items, GuiaBulkUpdate)
+    updates = [(index, guia.id, guia.model_dump(exclude_unset=True, exclude={"id"})) for index, guia in valid]
+    extra = {"id_usuario_updated": current_user.id, "updated_date": datetime.datetime.now()}
+    result = await bulk_update(session, Guia, updates, extra)
+    await response_cache.invalidate("guia", (guia.id for guia in result.items))
+    return with_errors(result, errors)
+
+
+@router.delete("/guia/bulk", response_model=BulkDeleteResult[int])
+async def delete_guias_bulk(
+        ids: Annotated[list[int], Body(max_length=settings.BULK_MAX_ITEMS)], session: AsyncSessionDep
+):
+    result = await bulk_delete(session, Guia, ids)
+    await response_cache.invalidate("guia", result.deleted)
+    return result
+
+
+def filter_guias(
+        statement: Select, idioma: list[str] | None, min_calificacion: float | None, id_operadora: int | None
+) -> Select:
+    if idioma:
+        statement = statement.where(json_array_contains(Guia.idiomas, idioma))
+    if min_calificacion is not None:
+        statement = statement.where(Guia.calificacion >= min_calificacion)
+    if id_operadora is not None:
+        statement = statement.where(Guia.id_operadora == id_operadora)
+    return statement
+
+
+@router.get("/guia", response_model=list[GuiaWithUser] | Page[GuiaWithUser])
 async def get_guia(
-        session: SessionDep,
+        request: Request,
+        session: AsyncSessionDep,
         offset: int = 0,
         limit: Annotated[int, Query(le=100)] = 100,
+        pagination: PaginationMode = "offset",
+        cursor: str | None = None,
+        idioma: Annotated[list[str] | None, Query()] = None,
+        min_calificacion: Annotated[float | None, Query(ge=0)] = None,
+        id_operadora: int | None = None,
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the response fields")] = None,
+):
+    guias = projection(Guia, GuiaWithUser, sparse_fields(fields, GuiaWithUser))
+
+    async def load():
+        statement = filter_guias(guias.statement(), idioma, min_calificacion, id_operadora)
+        if wants_cursor(pagination, cursor):
+            return guias.many(await keyset_page(session, statement, Guia, cursor, limit))
+        return guias.many((await session.exec(statement.offset(offset).limit(limit))).all())
+
+    return await cached_list(request, "guia", load)
+
+
+@router.get("/guia/export", response_class=StreamingResponse)
+async def export_guias(
+        request: Request,
+        format: ExportFormat = "ndjson",
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the exported columns")] = None,
+        created_since: datetime.datetime | None = None,
+        created_until: datetime.datetime | None = None,
+        idioma: Annotated[list[str] | None, Query()] = None,
+        min_calificacion: Annotated[float | None, Query(ge=0)] = None,
+        id_operadora: int | None = None,
 ):
-    guias = session.exec(select(Guia).offset(offset).limit(limit)).all()
-    return guias
+    # Flat columns: the embedded usuario of GuiaWithUser doesn't fit a CSV row
+    guias = projection(Guia, Guia, sparse_fields(fields, Guia))
+    statement = created_between(guias.statement(), Guia, created_since, created_until)
+    statement = filter_guias(statement, idioma, min_calificacion, id_operadora)
+    return export_response(request, "guias", guias, statement, format)
 
 
 @router.get("/guia/{id}", response_model=GuiaWithUser)
 async def get_guia(
+        request: Request,
         id: int,
-        session: SessionDep,
+        session: AsyncSessionDep,
 ):
-    guia = session.get(Guia, id)
-    if not guia:
-        raise HTTPException(status_code=404, detail="Guia no encontrado")
-    return guia
+    guias = projection(Guia, GuiaWithUser)
+
+    async def load():
+        guia = (await session.exec(guias.statement().where(Guia.id == id))).first()
+        if not guia:
+            raise HTTPException(status_code=404, detail="Guia no encontrado")
+        return guias.one(guia)
+
+    return await cached_item(request, "guia", id, load)
 
 
 @router.put("/guia/{id}", response_model=Guia)
 async def update_guia(
+        request: Request,
         id: int,
         guia: GuiaUpdate,
-        session: SessionDep,
-        current_user: User = Depends(get_current_active_superuser)
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
 ):
-    guia_db = session.get(Guia, id)
+    # Same loader options as GET /guia/{id}, so the ETag covers the embedded usuario too
+    guia_db = await session.get(Guia, id, options=load_options(Guia, GuiaWithUser))
     if not guia_db:
         raise HTTPException(status_code=404, detail="Guia no encontrado")
+    check_if_match(request, guia_db)
     guia_data = guia.model_dump(exclude_unset=True)
     guia_db.sqlmodel_update(
         guia_data,
@@ -66,19 +172,21 @@ async def update_guia(
         }
     )
     session.add(guia_db)
-    session.commit()
-    session.refresh(guia_db)
+    await session.commit()
+    await session.refresh(guia_db)
+    await response_cache.invalidate("guia", [id])
     return guia_db
 
 
 @router.delete("/guia/{id}")
 async def delete_guia(
         id: int,
-        session: SessionDep,
+        session: AsyncSessionDep,
 ):
-    guia = session.get(Guia, id)
+    guia = await session.get(Guia, id)
     if not guia:
         raise HTTPException(status_code=404, detail="Guia no encontrado")
-    session.delete(guia)
-    session.commit()
-    return JSONResponse(content={"message": "Guia eliminado", "Guia": jsonable_encoder(guia)})
+    await session.delete(guia)
+    await session.commit()
+    await response_cache.invalidate("guia", [id])
+    return ORJSONResponse(content={"message": "Guia eliminado", "Guia": guia.model_dump()})
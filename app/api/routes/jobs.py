@@ -0,0 +1,23 @@
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.deps import get_current_active_superuser
+from app.api.jobs import job_queue
+from app.models import Job, JobStatus
+
+router = APIRouter(tags=["jobs"], dependencies=[Depends(get_current_active_superuser)])
+
+
+@router.get("/jobs", response_model=list[Job])
+async def get_jobs(status: JobStatus | None = None, limit: Annotated[int, Query(le=100)] = 50):
+    return await job_queue.recent(status, limit)
+
+
+@router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: uuid.UUID):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    return job
@@ -1,22 +1,27 @@
 from datetime import timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
 
 from app import crud
-from app.api.deps import get_current_active_user
-from app.core.database import engine
+from app.api.deps import get_current_active_user, AsyncSessionDep
+from app.core.rate_limit import login_limiter
 from app.core.security import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.models import Token, User, UserPublic
+from app.models import Token, Principal, UserPublic
 
 router = APIRouter(tags=["login"])
 
 
 @router.post("/token")
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> Token:
-    user = crud.authenticate(session=Session(engine), email=form_data.username, password=form_data.password)
+async def login_for_access_token(
+        request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()], session: AsyncSessionDep
+) -> Token:
+    # request.client is the peer address; behind a proxy run uvicorn with --proxy-headers
+    await login_limiter.check(request.client.host if request.client else "", form_data.username)
+    user = await crud.authenticate_async(
+        session=session, email=form_data.username, password=form_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -24,12 +29,15 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
+    access_token = create_access_token(
+        data={"sub": user.email, "uid": str(user.id), "rol_id": user.rol_id, "estado_id": user.estado_id},
+        expires_delta=access_token_expires,
+    )
     return Token(access_token=access_token, token_type="bearer")
 
 
 @router.get("/test", response_model=UserPublic)
 async def read_users_me(
-        current_user: Annotated[User, Depends(get_current_active_user)],
+        current_user: Annotated[Principal, Depends(get_current_active_user)],
 ):
     return current_user
@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import LookupsDep, get_current_active_superuser, refresh_lookups
+
+router = APIRouter(tags=["lookups"], dependencies=[Depends(get_current_active_superuser)])
+
+
+@router.get("/lookups")
+async def get_lookups(registry: LookupsDep) -> dict[str, Any]:
+    return registry.to_dict()
+
+
+@router.post("/lookups/refresh")
+async def refresh(registry: LookupsDep) -> dict[str, Any]:
+    """Reload the rol and estado ids of the worker handling the request; send
+    SIGHUP to the server processes to refresh every worker."""
+    await refresh_lookups()
+    return registry.to_dict()
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_current_active_superuser, principal_cache
+from app.api.jobs import job_queue
+from app.api.response_cache import response_cache
+from app.core.database import get_pool_metrics
+from app.core.instrumentation import render_prometheus
+from app.core.rate_limit import login_limiter
+from app.core.security import hashing_pool
+
+router = APIRouter(tags=["metrics"], dependencies=[Depends(get_current_active_superuser)])
+# Mounted at the application root without auth, for the Prometheus scraper
+prometheus_router = APIRouter(tags=["metrics"], include_in_schema=False)
+
+
+@router.get("/metrics/hashing")
+async def get_hashing_metrics():
+    return hashing_pool.metrics()
+
+
+@router.get("/metrics/pool")
+async def get_db_pool_metrics():
+    return get_pool_metrics()
+
+
+def _gauges() -> dict[str, float]:
+    gauges: dict[str, float] = {}
+    for name, value in hashing_pool.metrics().items():
+        if isinstance(value, int | float):
+            gauges[f"password_hash_{name}"] = value
+    for engine_name, stats in get_pool_metrics().items():
+        for name, value in stats.items():
+            gauges[f"db_pool_{engine_name}_{name}"] = value
+    gauges["principal_cache_size"] = len(principal_cache)
+    gauges["principal_cache_hits"] = principal_cache.hits
+    gauges["principal_cache_misses"] = principal_cache.misses
+    gauges["response_cache_hits"] = response_cache.hits
+    gauges["response_cache_misses"] = response_cache.misses
+    for name, value in login_limiter.metrics().items():
+        gauges[f"login_{name}"] = value
+    for name, value in job_queue.metrics().items():
+        if isinstance(value, int | float):
+            gauges[f"jobs_{name}"] = value
+    return gauges
+
+
+@prometheus_router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    return render_prometheus(_gauges())
@@ -1,56 +1,277 @@
 import datetime
-from typing import Annotated
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from sqlmodel import select
+from fastapi import APIRouter, Body, Depends, Query, HTTPException, Request
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row
+from sqlmodel import or_, select
 
-from app.api.deps import get_current_active_superuser, SessionDep
-from app.models import Operadora, OperadoraCreate, User, OperadoraOut, OperadoraUpdate
+from app.api.batching import BatchLoader, partitioned_pages
+from app.api.bulk import (
+    BulkDeleteResult, BulkResult, bulk_delete, bulk_insert, bulk_update, reject_duplicates, table_rows, validate_items,
+    with_errors
+)
+from app.api.deps import get_current_active_superuser, AsyncSessionDep
+from app.api.export import ExportFormat, created_between, export_response
+from app.api.loading import load_options
+from app.api.pagination import Page, PaginationMode, keyset_page, wants_cursor
+from app.api.projection import Projection, projection, sparse_fields
+from app.api.response_cache import cached_item, cached_list, response_cache
+from app.api.responses import (
+    ORJSONResponse, Payload, Validators, check_if_match, conditional_response, precompile
+)
+from app.api.search import text_search
+from app.core.config import settings
+from app.models import (
+    Guia, GuiaWithUser, Operadora, OperadoraCreate, Principal, OperadoraOut, OperadoraUpdate, OperadoraBulkUpdate,
+    OperadoraStats, OperadoraStatsOut, OperadoraWithGuias
+)
+from app.stats import read_stats
 
 router = APIRouter(tags=["operadora"], dependencies=[Depends(get_current_active_superuser)])
+precompile(list[OperadoraOut])
 
 
 @router.post("/operadora", response_model=OperadoraOut)
 async def add_operadora(
         operadora_in: OperadoraCreate,
-        session: SessionDep,
-        current_user: User = Depends(get_current_active_superuser)
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
 ):
     operadora = Operadora.model_validate(operadora_in, update={"id_usuario_created": current_user.id})
     session.add(operadora)
-    session.commit()
-    session.refresh(operadora)
+    await session.commit()
+    await session.refresh(operadora)
+    await response_cache.invalidate("operadora")
     return operadora
 
 
-@router.get("/operadora", response_model=list[OperadoraOut])
+@router.post("/operadora/bulk", response_model=BulkResult[OperadoraOut])
+async def add_operadoras_bulk(
+        items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)],
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
+):
+    valid, errors = validate_items(items, OperadoraCreate)
+    correos = [operadora.correo for _, operadora in valid]
+    telefonos = [operadora.telefono for _, operadora in valid]
+    existing = (await session.exec(
+        select(Operadora.correo, Operadora.telefono)
+        .where(or_(Operadora.correo.in_(correos), Operadora.telefono.in_(telefonos)))
+    )).all()
+    valid = reject_duplicates(valid, "correo", {correo for correo, _ in existing}, "Correo ya registrado", errors)
+    valid = reject_duplicates(valid, "telefono", {telefono for _, telefono in existing}, "Teléfono ya registrado", errors)
+    rows = table_rows(Operadora, valid, errors, id_usuario_created=current_user.id)
+    result = await bulk_insert(session, Operadora, rows)
+    await response_cache.invalidate("operadora")
+    return with_errors(result, errors)
+
+
+@router.patch("/operadora/bulk", response_model=BulkResult[OperadoraOut])
+async def update_operadoras_bulk(
+        items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)],
+        session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
+):
+    valid, errors = validate_items(items, OperadoraBulkUpdate)
+    updates = [
+        (index, operadora.id, operadora.model_dump(exclude_unset=True, exclude={"id"})) for index, operadora in valid
+    ]
+    extra = {"id_usuario_updated": current_user.id, "updated_date": datetime.datetime.now()}
+    result = await bulk_update(session, Operadora, updates, extra)
+    await response_cache.invalidate("operadora", (operadora.id for operadora in result.items))
+    return with_errors(result, errors)
+
+
+@router.delete("/operadora/bulk", response_model=BulkDeleteResult[int])
+async def delete_operadoras_bulk(
+        ids: Annotated[list[int], Body(max_length=settings.BULK_MAX_ITEMS)], session: AsyncSessionDep
+):
+    result = await bulk_delete(session, Operadora, ids)
+    await response_cache.invalidate("operadora", result.deleted)
+    # Its cached /operadora/{id}/guias lists must turn into 404s
+    await response_cache.invalidate("guia")
+    return result
+
+
+def guias_loader(session: Any, offset: int, limit: int) -> BatchLoader[int, tuple[list[Row], int]]:
+    """Loads a page of guias, with their usuario, and the guia count per operadora id."""
+    guias = projection(Guia, GuiaWithUser)
+
+    async def fetch(ids: list[int]) -> dict[int, tuple[list[Row], int]]:
+        return await partitioned_pages(
+            session, guias.statement(), Guia.id_operadora, (Guia.created_date, Guia.id), ids, offset, limit
+        )
+
+    return BatchLoader(fetch, default=([], 0))
+
+
+def with_guias(
+        operadoras: Projection, content: list[Row] | dict[str, Any], pages: list[tuple[list[Row], int]]
+) -> Payload:
+    """Like ``operadoras.many(content)``, with each operadora's page of guias embedded."""
+    guias = projection(Guia, GuiaWithUser)
+    if isinstance(content, dict):
+        rows, next_cursor = content["items"], content["next_cursor"]
+    else:
+        rows, next_cursor = content, None
+
+    def render() -> bytes:
+        items = [
+            {**operadoras.item(row), "guias": [guias.item(guia) for guia in page], "guias_total": total}
+            for row, (page, total) in zip(rows, pages)
+        ]
+        return orjson.dumps({"items": items, "next_cursor": next_cursor} if isinstance(content, dict) else items)
+
+    versions = [version for row in rows for version in operadoras.versions(row)]
+    versions.extend(version for page, _ in pages for guia in page for version in guias.versions(guia))
+    # The totals change when a guia outside the embedded page is added or removed
+    totals = [total for _, total in pages]
+    return Payload(
+        validators=Validators.from_versions(versions, (next_cursor, totals, operadoras.sparse_fields)), render=render
+    )
+
+
+@router.get(
+    "/operadora",
+    response_model=list[OperadoraOut] | Page[OperadoraOut] | list[OperadoraWithGuias] | Page[OperadoraWithGuias]
+)
 async def get_operadora(
-        session: SessionDep,
+        request: Request,
+        session: AsyncSessionDep,
         offset: int = 0,
         limit: Annotated[int, Query(le=100)] = 100,
+        pagination: PaginationMode = "offset",
+        cursor: str | None = None,
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the response fields")] = None,
+        include: Annotated[Literal["guias"] | None, Query(description="Embed a page of each operadora's guias")] = None,
+        guias_offset: Annotated[int, Query(ge=0)] = 0,
+        guias_limit: Annotated[int, Query(ge=1, le=100)] = 10,
 ):
-    operadoras = session.exec(select(Operadora).offset(offset).limit(limit)).all()
-    return operadoras
+    operadoras = projection(Operadora, OperadoraOut, sparse_fields(fields, OperadoraOut))
 
+    async def load():
+        statement = operadoras.statement()
+        if wants_cursor(pagination, cursor):
+            content = await keyset_page(session, statement, Operadora, cursor, limit)
+        else:
+            content = (await session.exec(statement.offset(offset).limit(limit))).all()
+        if include != "guias":
+            return operadoras.many(content)
+        rows = content["items"] if isinstance(content, dict) else content
+        pages = await guias_loader(session, guias_offset, guias_limit).load_many(row.id for row in rows)
+        return with_guias(operadoras, content, pages)
 
-@router.get("/operadora/{operadora_id}", response_model=OperadoraOut)
-async def get_operadora_by_id(operadora_id: int, session: SessionDep):
-    operadora = session.get(Operadora, operadora_id)
-    if not operadora:
+    if include == "guias":
+        # Guia writes don't invalidate the operadora namespace, so these aren't cached
+        return conditional_response(request, await load())
+    return await cached_list(request, "operadora", load)
+
+
+@router.get("/operadora/search", response_model=list[OperadoraOut])
+async def search_operadoras(
+        request: Request,
+        session: AsyncSessionDep,
+        q: Annotated[str, Query(min_length=2, max_length=100)],
+        limit: Annotated[int, Query(le=50)] = 20,
+):
+    statement = text_search(
+        Operadora, q, documents=[Operadora.nombre, Operadora.razon_social], identifiers=[], limit=limit
+    )
+    operadoras = (await session.exec(statement.options(*load_options(Operadora, OperadoraOut)))).all()
+    return conditional_response(request, Payload.from_orm(list[OperadoraOut], operadoras))
+
+
+@router.get("/operadora/export", response_class=StreamingResponse)
+async def export_operadoras(
+        request: Request,
+        format: ExportFormat = "ndjson",
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the exported columns")] = None,
+        created_since: datetime.datetime | None = None,
+        created_until: datetime.datetime | None = None,
+):
+    operadoras = projection(Operadora, OperadoraOut, sparse_fields(fields, OperadoraOut))
+    statement = created_between(operadoras.statement(), Operadora, created_since, created_until)
+    return export_response(request, "operadoras", operadoras, statement, format)
+
+
+@router.get("/operadora/stats", response_model=list[OperadoraStatsOut])
+async def get_operadoras_stats(
+        session: AsyncSessionDep,
+        offset: int = 0,
+        limit: Annotated[int, Query(le=100)] = 100,
+):
+    """Guia counts, average calificacion and languages of the operadoras with guias."""
+    ids = (await session.exec(
+        select(OperadoraStats.id_operadora)
+        .where(OperadoraStats.guias > 0)
+        .order_by(OperadoraStats.id_operadora)
+        .offset(offset)
+        .limit(limit)
+    )).all()
+    return await read_stats(session, list(ids))
+
+
+@router.get("/operadora/{operadora_id}/stats", response_model=OperadoraStatsOut)
+async def get_operadora_stats(operadora_id: int, session: AsyncSessionDep):
+    stats = (await read_stats(session, [operadora_id]))[0]
+    # Operadoras without guias have no summary row
+    if not stats.guias and await session.get(Operadora, operadora_id) is None:
         raise HTTPException(status_code=404, detail="Operadora not encontrada")
-    return operadora
+    return stats
+
+
+@router.get("/operadora/{operadora_id}/guias", response_model=list[GuiaWithUser] | Page[GuiaWithUser])
+async def get_operadora_guias(
+        request: Request,
+        operadora_id: int,
+        session: AsyncSessionDep,
+        offset: int = 0,
+        limit: Annotated[int, Query(le=100)] = 100,
+        pagination: PaginationMode = "offset",
+        cursor: str | None = None,
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the response fields")] = None,
+):
+    guias = projection(Guia, GuiaWithUser, sparse_fields(fields, GuiaWithUser))
+
+    async def load():
+        statement = guias.statement().where(Guia.id_operadora == operadora_id)
+        if wants_cursor(pagination, cursor):
+            content = await keyset_page(session, statement, Guia, cursor, limit)
+        else:
+            content = (await session.exec(statement.offset(offset).limit(limit))).all()
+        rows = content["items"] if isinstance(content, dict) else content
+        if not rows and await session.get(Operadora, operadora_id) is None:
+            raise HTTPException(status_code=404, detail="Operadora not encontrada")
+        return guias.many(content)
+
+    # Cached with the guia lists, which every guia write invalidates
+    return await cached_list(request, "guia", load)
+
+
+@router.get("/operadora/{operadora_id}", response_model=OperadoraOut)
+async def get_operadora_by_id(request: Request, operadora_id: int, session: AsyncSessionDep):
+    operadoras = projection(Operadora, OperadoraOut)
+
+    async def load():
+        operadora = (await session.exec(operadoras.statement().where(Operadora.id == operadora_id))).first()
+        if not operadora:
+            raise HTTPException(status_code=404, detail="Operadora not encontrada")
+        return operadoras.one(operadora)
+
+    return await cached_item(request, "operadora", operadora_id, load)
 
 
 @router.put("/operadora/{operadora_id}", response_model=OperadoraOut)
 async def update_operadora(
-        operadora_id: int, operadora: OperadoraUpdate, session: SessionDep,
-        current_user: User = Depends(get_current_active_superuser)
+        request: Request, operadora_id: int, operadora: OperadoraUpdate, session: AsyncSessionDep,
+        current_user: Principal = Depends(get_current_active_superuser)
 ):
-    operadora_db = session.get(Operadora, operadora_id)
+    operadora_db = await session.get(Operadora, operadora_id)
     if not operadora_db:
         raise HTTPException(status_code=404, detail="Operadora not encontrada")
+    check_if_match(request, operadora_db)
     operadora_data = operadora.model_dump(exclude_unset=True)
     operadora_db.sqlmodel_update(
         operadora_data,
@@ -60,19 +281,23 @@ async def update_operadora(
          }
     )
     session.add(operadora_db)
-    session.commit()
-    session.refresh(operadora_db)
+    await session.commit()
+    await session.refresh(operadora_db)
+    await response_cache.invalidate("operadora", [operadora_id])
     return operadora_db
 
 
 @router.delete("/operadora/{operadora_id}")
 async def delete_operadora(
         operadora_id: int,
-        session: SessionDep,
+        session: AsyncSessionDep,
 ):
-    operadora = session.get(Operadora, operadora_id)
+    operadora = await session.get(Operadora, operadora_id)
     if not operadora:
         raise HTTPException(status_code=404, detail="No se encontro operadora")
-    session.delete(operadora)
-    session.commit()
-    return JSONResponse(content={"message": "Operadora eliminada", "Operadora": jsonable_encoder(operadora)})
+    await session.delete(operadora)
+    await session.commit()
+    await response_cache.invalidate("operadora", [operadora_id])
+    # Its cached /operadora/{id}/guias lists must turn into 404s
+    await response_cache.invalidate("guia")
+    return ORJSONResponse(content={"message": "Operadora eliminada", "Operadora": operadora.model_dump()})
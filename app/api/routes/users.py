@@ -1,61 +1,166 @@
+import datetime
 import uuid
-from typing import Annotated
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Body, Query, HTTPException, Request, UploadFile
 from fastapi.params import Depends
-from sqlmodel import select
+from fastapi.responses import StreamingResponse
+from sqlmodel import func, select
 
-from app.api.deps import SessionDep, get_current_active_superuser
-from app.core.security import get_password_hash
-from app.models import User, UserCreate, UserUpdate
+from app import crud
+from app.api.bulk import (
+    BulkDeleteResult, BulkResult, bulk_delete, bulk_update, validate_items, with_errors
+)
+from app.api.deps import AsyncSessionDep, get_current_active_superuser, invalidate_principal
+from app.api.export import ExportFormat, created_between, export_response
+from app.api.imports import insert_users, start_import
+from app.api.jobs import job_queue
+from app.api.loading import load_options
+from app.api.pagination import Page, PaginationMode, keyset_page, wants_cursor
+from app.api.projection import projection, sparse_fields
+from app.api.response_cache import invalidate_user_guias
+from app.api.responses import ORJSONResponse, Payload, check_if_match, conditional_response, precompile
+from app.api.search import text_search
+from app.core.config import settings
+from app.models import Job, Principal, User, UserCreate, UserOut, UserUpdate, UserBulkUpdate
 
 router = APIRouter(tags=["users"], dependencies=[Depends(get_current_active_superuser)])
+precompile(list[UserOut])
 
 
-@router.post("/users", response_model=User)
-async def add_user(user: UserCreate, session: SessionDep):
-    db_user = User.model_validate(user, update={"hashed_password": get_password_hash(user.password)})
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    return db_user
+@router.post("/users", response_model=UserOut)
+async def add_user(user: UserCreate, session: AsyncSessionDep):
+    user_db = await crud.create_user_async(session=session, user_create=user)
+    if settings.emails_enabled:
+        await job_queue.enqueue("new_account_email", email_to=user_db.email, nombre=user_db.nombre)
+    return user_db
+
+
+@router.post("/users/bulk", response_model=BulkResult[UserOut])
+async def add_users_bulk(
+        items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)], session: AsyncSessionDep
+):
+    valid, errors = validate_items(items, UserCreate)
+    return with_errors(await insert_users(session, valid, errors), errors)
+
+
+@router.post("/users/import", response_model=Job, status_code=202)
+async def import_users(
+        file: UploadFile,
+        current_user: Principal = Depends(get_current_active_superuser)
+):
+    return await start_import("users", file, current_user.id)
+
 
-@router.get("/users", response_model=list[User])
-async def get_users(session: SessionDep, offset: int = 0,limit: Annotated[int, Query(le=100)] = 100):
-    users = session.exec(select(User).offset(offset).limit(limit)).all()
-    return users
+@router.patch("/users/bulk", response_model=BulkResult[UserOut])
+async def update_users_bulk(
+        items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)], session: AsyncSessionDep
+):
+    valid, errors = validate_items(items, UserBulkUpdate)
+    updates = [(index, user.id, user.model_dump(exclude_unset=True, exclude={"id"})) for index, user in valid]
+    result = await bulk_update(session, User, updates, {"updated_date": datetime.datetime.now()})
+    for user in result.items:
+        invalidate_principal(user.id)
+    await invalidate_user_guias(session, (user.id for user in result.items))
+    return with_errors(result, errors)
 
-@router.get("/users/{user_id}", response_model=User)
-async def get_user_by_id(user_id: uuid.UUID, session: SessionDep):
-    user_db = session.get(User, user_id)
+
+@router.delete("/users/bulk", response_model=BulkDeleteResult[uuid.UUID])
+async def delete_users_bulk(
+        ids: Annotated[list[uuid.UUID], Body(max_length=settings.BULK_MAX_ITEMS)], session: AsyncSessionDep
+):
+    result = await bulk_delete(session, User, ids)
+    for user_id in result.deleted:
+        invalidate_principal(user_id)
+    return result
+
+@router.get("/users", response_model=list[UserOut] | Page[UserOut])
+async def get_users(
+        request: Request,
+        session: AsyncSessionDep,
+        offset: int = 0,
+        limit: Annotated[int, Query(le=100)] = 100,
+        pagination: PaginationMode = "offset",
+        cursor: str | None = None,
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the response fields")] = None,
+):
+    users = projection(User, UserOut, sparse_fields(fields, UserOut))
+    statement = users.statement()
+    if wants_cursor(pagination, cursor):
+        rows = await keyset_page(session, statement, User, cursor, limit)
+    else:
+        rows = (await session.exec(statement.offset(offset).limit(limit))).all()
+    return conditional_response(request, users.many(rows))
+
+@router.get("/users/search", response_model=list[UserOut])
+async def search_users(
+        request: Request,
+        session: AsyncSessionDep,
+        q: Annotated[str, Query(min_length=2, max_length=100)],
+        limit: Annotated[int, Query(le=50)] = 20,
+):
+    statement = text_search(
+        User, q,
+        documents=[User.nombre, User.apellido],
+        identifiers=[User.cedula, func.lower(User.email)],
+        limit=limit,
+    )
+    users = (await session.exec(statement.options(*load_options(User, UserOut)))).all()
+    return conditional_response(request, Payload.from_orm(list[UserOut], users))
+
+@router.get("/users/export", response_class=StreamingResponse)
+async def export_users(
+        request: Request,
+        format: ExportFormat = "ndjson",
+        fields: Annotated[str | None, Query(description="Comma-separated subset of the exported columns")] = None,
+        created_since: datetime.datetime | None = None,
+        created_until: datetime.datetime | None = None,
+        rol_id: int | None = None,
+        estado_id: int | None = None,
+):
+    users = projection(User, UserOut, sparse_fields(fields, UserOut))
+    statement = created_between(users.statement(), User, created_since, created_until)
+    if rol_id is not None:
+        statement = statement.where(User.rol_id == rol_id)
+    if estado_id is not None:
+        statement = statement.where(User.estado_id == estado_id)
+    return export_response(request, "users", users, statement, format)
+
+@router.get("/users/{user_id}", response_model=UserOut)
+async def get_user_by_id(request: Request, user_id: uuid.UUID, session: AsyncSessionDep):
+    users = projection(User, UserOut)
+    user_db = (await session.exec(users.statement().where(User.id == user_id))).first()
     if not user_db:
         raise HTTPException(status_code=404, detail="User not found")
-    return user_db
+    return conditional_response(request, users.one(user_db))
 
-@router.put("/users/{user_id}", response_model=User)
-async def update_user(user_id:uuid.UUID, user: UserUpdate, session: SessionDep):
-    user_db = session.get(User, user_id)
+@router.put("/users/{user_id}", response_model=UserOut)
+async def update_user(request: Request, user_id:uuid.UUID, user: UserUpdate, session: AsyncSessionDep):
+    user_db = await session.get(User, user_id)
     if not user_db:
         raise HTTPException(status_code=404, detail="User not found")
+    check_if_match(request, user_db)
     if user.email is not None and user.email != user_db.email:
-        existing_user = session.exec(select(User).where(User.email == user.email, User.id != user_id)).first()
+        existing_user = (await session.exec(select(User).where(User.email == user.email, User.id != user_id))).first()
         if existing_user:
             raise HTTPException(status_code=409, detail="Este correo ya está en uso")
     user_data = user.model_dump(exclude_unset=True)
-    user_db.sqlmodel_update(user_data)
+    user_db.sqlmodel_update(user_data, update={"updated_date": datetime.datetime.now()})
     session.add(user_db)
-    session.commit()
-    session.refresh(user_db)
+    await session.commit()
+    await session.refresh(user_db)
+    invalidate_principal(user_id)
+    await invalidate_user_guias(session, [user_id])
     return user_db
 
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: uuid.UUID, session: SessionDep):
-    user_db = session.get(User, user_id)
+async def delete_user(user_id: uuid.UUID, session: AsyncSessionDep):
+    user_db = await session.get(User, user_id)
     if not user_db:
         raise HTTPException(status_code=404, detail="User not found")
-    session.delete(user_db)
-    session.commit()
-    return JSONResponse(content={"message":"Usuario Eliminado","user":jsonable_encoder(user_db)})
+    user_out = UserOut.model_validate(user_db, from_attributes=True)
+    await session.delete(user_db)
+    await session.commit()
+    invalidate_principal(user_id)
+    return ORJSONResponse(content={"message":"Usuario Eliminado","user":user_out.model_dump()})
 
@@ -0,0 +1,89 @@
+import re
+from typing import Any
+
+from sqlalchemy import and_, case, exists, false, func, literal, literal_column, or_, union
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.core.config import settings
+from app.core.database import get_engine
+from app.core.text import unaccent
+
+# Names aren't stemmed: 'simple' only lowercases, f_unaccent folds the accents.
+# Literal SQL keeps these expressions identical to the ones the indexes were built on.
+TS_CONFIG = literal_column("'simple'::regconfig")
+SPACE = literal_column("' '")
+EMPTY = literal_column("''")
+
+
+def json_array_contains(column: Any, values: list[str]) -> Any:
+    """Match rows whose JSON array ``column`` holds every one of ``values``.
+
+    Postgres uses JSONB containment (``@>``), which the GIN index serves. Other
+    dialects (the SQLite stand-in) expand the array with ``json_each`` instead.
+    """
+    if get_engine().dialect.name == "postgresql":
+        return column.op("@>")(literal(values, JSONB))
+    elements = func.json_each(column).table_valued("value")
+    return and_(*(exists(select(1).select_from(elements).where(elements.c.value == value)) for value in values))
+
+
+def normalize(value: str) -> str:
+    return unaccent(value).lower()
+
+
+def _document(columns: list[Any]) -> Any:
+    # || yields NULL if any column is NULL, which would make the whole row unsearchable
+    columns = [func.coalesce(column, EMPTY) for column in columns]
+    document = columns[0]
+    for column in columns[1:]:
+        document = document + SPACE + column
+    return func.to_tsvector(TS_CONFIG, func.f_unaccent(document))
+
+
+def _like_prefix(value: str) -> str:
+    return re.sub(r"([/%_])", r"/\1", value) + "%"
+
+
+def _starts_word(text: Any, term: str) -> Any:
+    pattern = _like_prefix(term)
+    return or_(text.like(pattern, escape="/"), text.like("% " + pattern, escape="/"))
+
+
+def text_search(model: Any, q: str, documents: list[Any], identifiers: list[Any], limit: int) -> SelectOfScalar:
+    """Ranked search over a model: word-prefix full text on ``documents`` and
+    plain prefix matching on ``identifiers`` (cedula, email...), accent and case
+    insensitive.
+
+    Identifier hits come first, then the best ranked documents. Each kind of
+    match is capped at SEARCH_MAX_CANDIDATES rows before anything is ranked,
+    so a very common prefix costs two index scans of bounded size instead of
+    ranking every matching row of a large table.
+    """
+    needle = normalize(q.strip())
+    terms = re.findall(r"\w+", needle)
+    identifier_match = or_(false(), *(column.like(_like_prefix(needle), escape="/") for column in identifiers))
+    if not terms:
+        document_match, document_rank = false(), literal(0.0)
+    elif get_engine().dialect.name == "postgresql":
+        document = _document(documents)
+        query = func.to_tsquery(TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        document_match, document_rank = document.op("@@")(query), func.ts_rank(document, query)
+    else:
+        # SQLite stand-in: every term must start a word in one of the documents
+        texts = [func.lower(func.f_unaccent(column)) for column in documents]
+        document_match = and_(*(or_(*(_starts_word(text, term) for text in texts)) for term in terms))
+        document_rank = literal(0.0)
+    # Unordered on purpose: each scan stops after the cap, served by its GIN index
+    capped = [
+        select(model.id).where(match).limit(settings.SEARCH_MAX_CANDIDATES).subquery()
+        for match in (identifier_match, document_match)
+    ]
+    candidates = union(*(select(hits.c.id) for hits in capped)).subquery()
+    return (
+        select(model)
+        .join(candidates, model.id == candidates.c.id)
+        .order_by(case((identifier_match, 1), else_=0).desc(), document_rank.desc(), model.id)
+        .limit(limit)
+    )
@@ -0,0 +1,61 @@
+import logging
+import os
+
+# Benchmarks default to a throwaway SQLite stand-in; export DATABASE_URL to use Postgres
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.sqlite")
+
+from sqlalchemy import Engine, event  # noqa: E402
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import get_async_engine, get_engine, init_db  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.models import User  # noqa: E402
+from app.seeders.guia import create_guias  # noqa: E402
+from app.seeders.operadora import create_operadoras  # noqa: E402
+from app.seeders.users import create_user  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+class StatementCounter:
+    """Counts the statements sent to ``engines``, by default every engine the app's sessions use."""
+
+    def __init__(self, *engines: Engine):
+        if not engines:
+            # With DB_ASYNC the sessions run on the async engine; a few helpers still use the sync one
+            engines = (get_engine(), get_async_engine().sync_engine) if settings.DB_ASYNC else (get_engine(),)
+        self.engines = engines
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+
+
+def prepare_database(users: int, operadoras: int, guias: int, reset: bool = True) -> None:
+    """Create the schema (SQLite only, Postgres is expected to be migrated) and seed it."""
+    if get_engine().dialect.name == "sqlite":
+        if reset:
+            SQLModel.metadata.drop_all(get_engine())
+        SQLModel.metadata.create_all(get_engine())
+    with Session(get_engine()) as session:
+        init_db(session)
+    for report in (create_user(users), create_operadoras(operadoras), create_guias(guias)):
+        logger.info(str(report))
+
+
+def superuser_headers() -> dict[str, str]:
+    with Session(get_engine()) as session:
+        admin = session.exec(select(User).where(User.email == settings.FIRST_SUPERUSER)).one()
+        token = create_access_token({"sub": admin.email, "uid": str(admin.id)})
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,276 @@
+"""Concurrent HTTP benchmark for the main API flows.
+
+Seeds the database through the seeders, then drives login, list, detail,
+create and update requests and reports latency percentiles, throughput and
+DB statements per request:
+
+    python -m app.benchmarks.load --requests 500 --concurrency 20
+    python -m app.benchmarks.load --compare app/benchmarks/baseline.json
+
+By default the app runs in-process on a SQLite stand-in; export DATABASE_URL
+to use Postgres, or pass --base-url to hit a running server (statement counts
+are then unavailable).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable
+
+# The login scenario measures bcrypt throughput from a single client, not the
+# brute-force limits; set before the settings are loaded
+os.environ.setdefault("LOGIN_IP_LIMIT", "1000000000")
+os.environ.setdefault("LOGIN_EMAIL_LIMIT", "1000000000")
+os.environ.setdefault("LOGIN_GLOBAL_RATE_PER_SECOND", "1000000000")
+os.environ.setdefault("LOGIN_GLOBAL_BURST", "1000000000")
+
+import httpx  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.benchmarks.common import StatementCounter, prepare_database, superuser_headers  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import get_engine  # noqa: E402
+from app.core.lookups import lookups  # noqa: E402
+from app.models import Guia, Operadora, RolEnum, User  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SEED_PASSWORD = "password"
+
+
+@dataclass
+class Context:
+    headers: dict[str, str]
+    login_emails: list[str]
+    guia_ids: list[int]
+    operadora_ids: list[int]
+    user_ids: list[str]
+    run_id: int
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    seconds: float
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    statements_per_request: float | None
+
+
+Scenario = Callable[[httpx.AsyncClient, int, Context], Awaitable[httpx.Response]]
+
+
+async def login(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    email = ctx.login_emails[i % len(ctx.login_emails)]
+    return await client.post(f"{settings.API_V1_STR}/token", data={"username": email, "password": SEED_PASSWORD})
+
+
+async def list_guia(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    return await client.get(f"{settings.API_V1_STR}/guia?limit=100", headers=ctx.headers)
+
+
+async def list_operadora(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    return await client.get(f"{settings.API_V1_STR}/operadora?limit=100", headers=ctx.headers)
+
+
+async def list_users(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    return await client.get(f"{settings.API_V1_STR}/users?limit=100", headers=ctx.headers)
+
+
+async def detail_guia(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    return await client.get(f"{settings.API_V1_STR}/guia/{random.choice(ctx.guia_ids)}", headers=ctx.headers)
+
+
+async def detail_user(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    return await client.get(f"{settings.API_V1_STR}/users/{random.choice(ctx.user_ids)}", headers=ctx.headers)
+
+
+async def create_operadora(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    suffix = f"{ctx.run_id % 10_000:04d}{i:06d}"
+    body = {
+        "nombre": f"Bench {suffix}",
+        "razon_social": f"Bench {suffix}",
+        "correo": f"bench{suffix}@example.com",
+        "telefono": suffix[-10:],
+        "direccion": "Benchmark",
+    }
+    return await client.post(f"{settings.API_V1_STR}/operadora", json=body, headers=ctx.headers)
+
+
+async def update_guia(client: httpx.AsyncClient, i: int, ctx: Context) -> httpx.Response:
+    body = {"calificacion": random.randint(1, 5), "id_operadora": random.choice(ctx.operadora_ids)}
+    return await client.put(f"{settings.API_V1_STR}/guia/{random.choice(ctx.guia_ids)}", json=body, headers=ctx.headers)
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "login": login,
+    "list_guia": list_guia,
+    "list_operadora": list_operadora,
+    "list_users": list_users,
+    "detail_guia": detail_guia,
+    "detail_user": detail_user,
+    "create_operadora": create_operadora,
+    "update_guia": update_guia,
+}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, requests: int, concurrency: int,
+                       ctx: Context, count_statements: bool) -> ScenarioResult:
+    scenario = SCENARIOS[name]
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            start = time.perf_counter()
+            response = await scenario(client, i, ctx)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    with StatementCounter() as counter:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+    latencies.sort()
+    return ScenarioResult(
+        name=name,
+        requests=requests,
+        errors=errors,
+        seconds=seconds,
+        rps=requests / seconds if seconds else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        statements_per_request=counter.count / requests if count_statements else None,
+    )
+
+
+def load_context(login_users: int) -> Context:
+    with Session(get_engine()) as session:
+        lookups.load_sync(session)
+        user_rol = lookups.rol_id(RolEnum.USER)
+        login_emails = session.exec(select(User.email).where(User.rol_id == user_rol).limit(login_users)).all()
+        return Context(
+            headers=superuser_headers(),
+            login_emails=list(login_emails) or [settings.FIRST_SUPERUSER],
+            guia_ids=list(session.exec(select(Guia.id).limit(1000)).all()),
+            operadora_ids=list(session.exec(select(Operadora.id).limit(1000)).all()),
+            user_ids=[str(id) for id in session.exec(select(User.id).limit(1000)).all()],
+            run_id=int(time.time()),
+        )
+
+
+def print_results(results: list[ScenarioResult]) -> None:
+    print(f"{'scenario':18} {'req':>6} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'stmt/req':>9}")
+    for r in results:
+        statements = "-" if r.statements_per_request is None else f"{r.statements_per_request:.2f}"
+        print(f"{r.name:18} {r.requests:>6} {r.errors:>5} {r.rps:>9.1f} {r.p50_ms:>9.2f} "
+              f"{r.p95_ms:>9.2f} {r.p99_ms:>9.2f} {statements:>9}")
+
+
+def compare(results: list[ScenarioResult], baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get(r.name)
+        if base is None:
+            continue
+        if r.p95_ms > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r.name}: p95 {r.p95_ms:.2f}ms vs baseline {base['p95_ms']:.2f}ms")
+        if r.rps < base["rps"] * (1 - tolerance):
+            regressions.append(f"{r.name}: {r.rps:.1f} rps vs baseline {base['rps']:.1f} rps")
+        base_statements = base.get("statements_per_request")
+        if None not in (base_statements, r.statements_per_request) and r.statements_per_request > base_statements:
+            regressions.append(
+                f"{r.name}: {r.statements_per_request:.2f} statements/request vs baseline {base_statements:.2f}"
+            )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=20, help="requests for the bcrypt-bound login scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=1000, help="users to seed")
+    parser.add_argument("--operadoras", type=int, default=50, help="operadoras to seed")
+    parser.add_argument("--guias", type=int, default=500, help="guias to seed")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="write results as the new baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="fail on regressions against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95/rps drift when comparing")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> list[ScenarioResult]:
+    if not args.no_seed:
+        prepare_database(users=args.users, operadoras=args.operadoras, guias=args.guias)
+    ctx = load_context(login_users=args.concurrency)
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60)
+    results = []
+    async with client:
+        # Warm-up: principal cache, connection pool, lazily built loader options
+        await list_guia(client, 0, ctx)
+        for name in args.scenarios:
+            requests = args.login_requests if name == "login" else args.requests
+            results.append(await run_scenario(
+                client, name, requests, args.concurrency, ctx, count_statements=not args.base_url
+            ))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "environment": {
+                    "python": platform.python_version(),
+                    "database": get_engine().dialect.name,
+                    "db_async": settings.DB_ASYNC,
+                    "cpus": os.cpu_count(),
+                    "concurrency": args.concurrency,
+                },
+                "results": [asdict(r) for r in results],
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.save_baseline}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("No regressions against", args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
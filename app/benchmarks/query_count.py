@@ -0,0 +1,81 @@
+"""Fails when a read endpoint's statement count grows with the page size.
+
+Runs the API in-process against a throwaway SQLite database:
+
+    python -m app.benchmarks.query_count
+"""
+import os
+import sys
+
+# Cached responses would hide the statements this check exists to count
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.benchmarks.common import StatementCounter, prepare_database, superuser_headers  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import get_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Guia  # noqa: E402
+
+PAGE_SIZES = (1, 10, 100)
+MAX_STATEMENTS = 2
+LIST_ENDPOINTS = (
+    "/users",
+    "/users?pagination=cursor",
+    "/operadora",
+    "/operadora?pagination=cursor",
+    "/operadora?include=guias",
+    "/operadora/{id_operadora}/guias",
+    "/guia",
+    "/guia?pagination=cursor",
+)
+DETAIL_ENDPOINTS = ("/users/{id_usuario}", "/operadora/{id_operadora}", "/guia/{id}")
+
+
+def seed(rows: int) -> dict[str, str]:
+    prepare_database(users=rows, operadoras=rows, guias=rows)
+    with Session(get_engine()) as session:
+        guia = session.exec(select(Guia)).first()
+        return {key: str(value) for key, value in guia.model_dump().items()}
+
+
+def count_statements(client: TestClient, path: str, headers: dict[str, str]) -> int:
+    with StatementCounter() as counter:
+        response = client.get(settings.API_V1_STR + path, headers=headers)
+    response.raise_for_status()
+    return counter.count
+
+
+def main() -> int:
+    fixture = seed(max(PAGE_SIZES) + 1)
+    headers = superuser_headers()
+    client = TestClient(app)
+    # Warm the principal cache so only the endpoint's own statements are counted
+    client.get(settings.API_V1_STR + "/test", headers=headers).raise_for_status()
+
+    failures = []
+    for template in LIST_ENDPOINTS:
+        path = template.format(**fixture)
+        separator = "&" if "?" in path else "?"
+        counts = {size: count_statements(client, f"{path}{separator}limit={size}", headers) for size in PAGE_SIZES}
+        print(f"{template:35} {counts}")
+        if len(set(counts.values())) > 1 or max(counts.values()) > MAX_STATEMENTS:
+            failures.append(template)
+    for template in DETAIL_ENDPOINTS:
+        path = template.format(**fixture)
+        count = count_statements(client, path, headers)
+        print(f"{template:35} {count}")
+        if count > MAX_STATEMENTS:
+            failures.append(template)
+
+    if failures:
+        print(f"FAIL: statement count not constant or above {MAX_STATEMENTS}: {', '.join(failures)}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
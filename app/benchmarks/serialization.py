@@ -0,0 +1,123 @@
+"""Compares the ways a 100-row list page can be turned into JSON.
+
+    python -m app.benchmarks.serialization --rows 100 --repeat 200
+
+Each strategy fetches the page from the seeded database and serializes it:
+
+- ``jsonable_encoder``: ORM rows through jsonable_encoder and json.dumps
+- ``response_model``: ORM rows validated and dumped through a fresh TypeAdapter,
+  which is what FastAPI does per request for ``response_model``
+- ``type_adapter``: the same with a precompiled TypeAdapter
+- ``projection``: only the response columns, row tuples to dicts to orjson
+
+Validation is most of the ORM paths' cost: EmailStr fields run email-validator
+on every row, which the projection path skips since the rows come from the
+database already validated.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlmodel import Session, select
+
+from app.api.loading import load_options
+from app.api.projection import projection
+from app.benchmarks.common import prepare_database
+from app.core.database import get_engine
+from app.models import Guia, GuiaWithUser, Operadora, OperadoraOut, User, UserOut
+
+RESOURCES = {
+    "user": (User, UserOut),
+    "operadora": (Operadora, OperadoraOut),
+    "guia": (Guia, GuiaWithUser),
+}
+
+Strategy = Callable[[Session, Any, Any, int], bytes]
+
+
+def _orm_rows(session: Session, model: Any, response_model: Any, rows: int) -> list[Any]:
+    return list(session.exec(select(model).options(*load_options(model, response_model)).limit(rows)).all())
+
+
+def jsonable_encoder_strategy(session: Session, model: Any, response_model: Any, rows: int) -> bytes:
+    return json.dumps(jsonable_encoder(_orm_rows(session, model, response_model, rows))).encode()
+
+
+def response_model_strategy(session: Session, model: Any, response_model: Any, rows: int) -> bytes:
+    adapter = TypeAdapter(list[response_model])
+    content = _orm_rows(session, model, response_model, rows)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+_precompiled = {response_model: TypeAdapter(list[response_model]) for _, response_model in RESOURCES.values()}
+
+
+def type_adapter_strategy(session: Session, model: Any, response_model: Any, rows: int) -> bytes:
+    adapter = _precompiled[response_model]
+    content = _orm_rows(session, model, response_model, rows)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def projection_strategy(session: Session, model: Any, response_model: Any, rows: int) -> bytes:
+    page = projection(model, response_model)
+    return page.many(session.exec(page.statement().limit(rows)).all()).render()
+
+
+STRATEGIES: dict[str, Strategy] = {
+    "jsonable_encoder": jsonable_encoder_strategy,
+    "response_model": response_model_strategy,
+    "type_adapter": type_adapter_strategy,
+    "projection": projection_strategy,
+}
+
+
+def measure(strategy: Strategy, model: Any, response_model: Any, rows: int, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        # A fresh session per page, like a request, so the identity map can't serve rows
+        with Session(get_engine()) as session:
+            start = time.perf_counter()
+            strategy(session, model, response_model, rows)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=200, help="pages per strategy")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if not args.no_seed:
+        prepare_database(users=args.rows * 2, operadoras=args.rows, guias=args.rows)
+    print(f"{'resource':10} {'strategy':18} {'mean ms':>9} {'p95 ms':>9} {'speedup':>8}")
+    for resource, (model, response_model) in RESOURCES.items():
+        # Outputs must be identical for the comparison to mean anything
+        with Session(get_engine()) as session:
+            outputs = [json.loads(strategy(session, model, response_model, args.rows))
+                       for name, strategy in STRATEGIES.items() if name != "jsonable_encoder"]
+        if any(output != outputs[0] for output in outputs):
+            print(f"{resource}: strategies produced different JSON")
+            return 1
+        baseline = None
+        for name, strategy in STRATEGIES.items():
+            timings = sorted(measure(strategy, model, response_model, args.rows, args.repeat))
+            mean = statistics.fmean(timings) * 1000
+            p95 = timings[int(0.95 * (len(timings) - 1))] * 1000
+            baseline = baseline or mean
+            print(f"{resource:10} {name:18} {mean:>9.3f} {p95:>9.3f} {baseline / mean:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Cold start of a worker: import time of app.main plus the lifespan startup.
+
+Each run is a fresh interpreter. The report lists the slowest imports from
+``python -X importtime`` by self and by top-level package, and the check
+fails when the median boot exceeds the budget or app.main pulls in a
+module that should only load on demand:
+
+    python -m app.benchmarks.startup
+    python -m app.benchmarks.startup --budget 2.5 --runs 5 --output startup.json
+
+Runs on the same SQLite stand-in as the other benchmarks unless DATABASE_URL
+is exported.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.sqlite")
+
+TARGET = "app.main"
+DEFAULT_BUDGET_SECONDS = 3.0
+# Loaded lazily by the code that needs them, never by importing the app
+LAZY_MODULES = ("faker", "sentry_sdk", "passlib", "jinja2", "emails", "psycopg")
+
+
+@dataclass
+class ImportTime:
+    name: str
+    self_ms: float
+    cumulative_ms: float
+
+
+@dataclass
+class Boot:
+    # Interpreter start to the end of the lifespan startup, measured by the parent
+    total_seconds: float
+    import_seconds: float
+    startup_seconds: float
+    eager_modules: list[str]
+
+
+def parse_importtime(stderr: str) -> list[ImportTime]:
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        imports.append(ImportTime(name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return imports
+
+
+def profile_imports() -> list[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {TARGET}"], capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def by_package(imports: list[ImportTime]) -> dict[str, float]:
+    totals: collections.Counter[str] = collections.Counter()
+    for item in imports:
+        totals[item.name.split(".")[0]] += item.self_ms
+    return dict(totals.most_common())
+
+
+def measure_boot() -> Boot:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "app.benchmarks.startup", "--child"], capture_output=True, text=True, check=True
+    )
+    total = time.perf_counter() - start
+    child = json.loads(result.stdout.splitlines()[-1])
+    return Boot(total_seconds=total, **child)
+
+
+def child() -> None:
+    """Runs in the measured interpreter: import the app and run its startup."""
+    start = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+    eager = sorted(name for name in LAZY_MODULES if name in sys.modules)
+
+    async def startup() -> float:
+        async with app.router.lifespan_context(app):
+            return time.perf_counter()
+
+    started = asyncio.run(startup())
+    print(json.dumps({
+        "import_seconds": imported - start,
+        "startup_seconds": started - imported,
+        "eager_modules": eager,
+    }))
+
+
+def prepare() -> None:
+    # Schema and lookup rows, so the measured startup loads them like a real worker
+    from sqlmodel import Session, SQLModel
+
+    from app.core.database import get_engine, init_db
+
+    engine = get_engine()
+    if engine.dialect.name == "sqlite":
+        SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        init_db(session)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to take the median of")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="max median boot in seconds")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        child()
+        return 0
+    prepare()
+
+    imports = profile_imports()
+    target = next(item for item in imports if item.name == TARGET)
+    print(f"import {TARGET}: {target.cumulative_ms:.0f}ms, {len(imports)} modules")
+    print("\nslowest imports (self):")
+    for item in sorted(imports, key=lambda item: item.self_ms, reverse=True)[:args.top]:
+        print(f"  {item.self_ms:8.1f}ms  {item.name}")
+    packages = by_package(imports)
+    print("\nby package (sum of self):")
+    for name, ms in list(packages.items())[:args.top]:
+        print(f"  {ms:8.1f}ms  {name}")
+
+    boots = [measure_boot() for _ in range(args.runs)]
+    median = statistics.median(boot.total_seconds for boot in boots)
+    print(f"\nboot over {args.runs} runs: median {median:.2f}s (budget {args.budget:.2f}s)")
+    for boot in boots:
+        print(f"  total {boot.total_seconds:.2f}s  import {boot.import_seconds:.2f}s  "
+              f"startup {boot.startup_seconds:.2f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "imports": [asdict(item) for item in imports],
+                "packages": packages,
+                "boots": [asdict(boot) for boot in boots],
+            }, f, indent=2)
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median boot {median:.2f}s over the {args.budget:.2f}s budget")
+    eager = sorted({name for boot in boots for name in boot.eager_modules})
+    if eager:
+        failures.append(f"{TARGET} imports {', '.join(eager)} eagerly")
+    if failures:
+        print(f"FAIL: {'; '.join(failures)}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
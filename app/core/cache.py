@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Protocol
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def values(self) -> list[Any]:
+        now = time.monotonic()
+        with self._lock:
+            return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+    async def incr(self, key: str) -> int: ...
+
+    async def close(self) -> None: ...
+
+
+class MemoryBackend:
+    """Per-process backend: values in a TTLCache, counters in a dict so LRU
+    eviction can never roll a generation back."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.values = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self.counters:
+            return str(self.counters[key]).encode()
+        return self.values.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.values.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.values.delete(key)
+            self.counters.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis.asyncio client used by
+    RedisBackend, selected with REDIS_URL=memory:// for local runs."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, bytes]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes | str | int, ex: float | None = None) -> None:
+        expires_at = time.monotonic() + ex if ex else None
+        self._data[key] = (expires_at, value if isinstance(value, bytes) else str(value).encode())
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        expires_at = self._data.get(key, (None, b""))[0]
+        self._data[key] = (expires_at, str(value).encode())
+        return value
+
+    async def expire(self, key: str, seconds: float) -> bool:
+        if key not in self._data:
+            return False
+        self._data[key] = (time.monotonic() + seconds, self._data[key][1])
+        return True
+
+    async def aclose(self) -> None:
+        pass
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        if url.startswith("memory://"):
+            self.client: Any = LocalRedis()
+            return
+        try:
+            from redis.asyncio import Redis
+        except ImportError as exc:
+            raise RuntimeError("The redis backends require the redis package") from exc
+        self.client = Redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, ex=max(1, int(ttl)))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def close(self) -> None:
+        await self.client.aclose()
@@ -33,6 +33,9 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Resolved users are cached per worker; PUT/DELETE /users/{id} evicts them
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAXSIZE: int = 10_000
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -49,6 +52,11 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str
     SENTRY_DSN: HttpUrl | None = None
+    SENTRY_TRACES_SAMPLE_RATE: float = 0.1
+    # Request instrumentation: Server-Timing header, /metrics and slow query log
+    SERVER_TIMING_ENABLED: bool = True
+    METRICS_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: int = 200
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str
@@ -67,6 +75,109 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # Overrides the POSTGRES_* settings, e.g. sqlite:///./bench.sqlite for benchmarks
+    DATABASE_URL: str | None = None
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def database_url(self) -> str:
+        return self.DATABASE_URL or str(self.SQLALCHEMY_DATABASE_URI)
+
+    # Run the routers on the psycopg async driver instead of blocking sync sessions
+    DB_ASYNC: bool = False
+    # Connection pool, applied per engine and per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Server-side statement_timeout in milliseconds, 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Connections the database grants this app in total, across every worker process of
+    # every instance. When set, each worker's pools are sized to fit it instead of
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW, keeping DB_RESERVED_CONNECTIONS free for
+    # migrations, cron jobs and psql sessions
+    DB_MAX_CONNECTIONS: int | None = None
+    DB_RESERVED_CONNECTIONS: int = 5
+    # Connections each worker opens at startup, so the first requests don't pay for them
+    DB_POOL_WARM_CONNECTIONS: int = 1
+
+    # Server processes per instance (uvicorn reads the same variable) and instances
+    # sharing the database; python -m app.server starts WEB_CONCURRENCY workers
+    WEB_CONCURRENCY: int = 1
+    APP_INSTANCES: int = 1
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    # On SIGTERM workers stop accepting connections and wait this long for in-flight requests
+    SHUTDOWN_DRAIN_SECONDS: int = 20
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def db_connections_per_worker(self) -> int | None:
+        if self.DB_MAX_CONNECTIONS is None:
+            return None
+        workers = self.WEB_CONCURRENCY * self.APP_INSTANCES
+        return (self.DB_MAX_CONNECTIONS - self.DB_RESERVED_CONNECTIONS) // workers
+
+    @model_validator(mode="after")
+    def _check_connection_budget(self) -> Self:
+        per_worker = self.db_connections_per_worker
+        # The async mode keeps a connection for the sync engine as well
+        needed = 2 if self.DB_ASYNC else 1
+        if per_worker is not None and per_worker < needed:
+            raise ValueError(
+                f"DB_MAX_CONNECTIONS={self.DB_MAX_CONNECTIONS} leaves {per_worker} connections for each of "
+                f"{self.WEB_CONCURRENCY * self.APP_INSTANCES} workers, at least {needed} are needed"
+            )
+        return self
+
+    # Bulk endpoints: max items per request and rows per INSERT/commit
+    BULK_MAX_ITEMS: int = 5000
+    BULK_CHUNK_SIZE: int = 500
+
+    # Serialized operadora/guia GET responses; "memory" is per worker, "redis" is shared
+    # (needs the redis package; REDIS_URL=memory:// runs an in-process stand-in)
+    RESPONSE_CACHE_BACKEND: Literal["memory", "redis", "none"] = "memory"
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    RESPONSE_CACHE_MAXSIZE: int = 2000
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # POST /token limits, checked before the user lookup and bcrypt: attempts per client IP
+    # and per email in sliding windows ("redis" shares them between workers, through
+    # REDIS_URL), plus a token bucket capping each worker's login rate
+    LOGIN_RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    LOGIN_IP_LIMIT: int = 20
+    LOGIN_IP_WINDOW_SECONDS: int = 60
+    LOGIN_EMAIL_LIMIT: int = 5
+    LOGIN_EMAIL_WINDOW_SECONDS: int = 300
+    LOGIN_GLOBAL_RATE_PER_SECOND: float = 20
+    LOGIN_GLOBAL_BURST: int = 40
+
+    # Search endpoints: identifier and full-text matches each capped at this many rows
+    # before they're ranked, which bounds the cost of very common prefixes
+    SEARCH_MAX_CANDIDATES: int = 1000
+
+    # Export endpoints: rows fetched per server-side cursor round trip
+    EXPORT_BATCH_SIZE: int = 1000
+    # CSV imports run as jobs in BULK_CHUNK_SIZE batches, reporting up to this many row errors
+    IMPORT_MAX_ERRORS: int = 1000
+
+    # Background jobs: "memory" keeps them in the worker that enqueued them, "database"
+    # stores them in the job table where any worker can claim them
+    JOBS_BACKEND: Literal["memory", "database"] = "memory"
+    JOBS_CONCURRENCY: int = 4
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BACKOFF_SECONDS: float = 1
+    JOBS_POLL_INTERVAL_SECONDS: float = 1
+    JOBS_SHUTDOWN_TIMEOUT_SECONDS: float = 10
+    # Database jobs still RUNNING this long after being claimed are assumed to have lost
+    # their worker and are queued again; keep it above the longest job
+    JOBS_STALE_AFTER_SECONDS: float = 15 * 60
+    JOBS_REAP_INTERVAL_SECONDS: float = 60
+    # Jobs of the memory backend stay queryable this long
+    JOBS_TTL_SECONDS: int = 24 * 60 * 60
+    JOBS_MAXSIZE: int = 10_000
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -89,6 +200,13 @@ class Settings(BaseSettings):
     def emails_enabled(self) -> bool:
         return bool(self.SMTP_HOST and self.EMAILS_FROM_EMAIL)
 
+    # bcrypt runs outside the event loop in this pool; past the queue limit
+    # requests are rejected with 503 instead of piling up behind the workers
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+
     EMAIL_TEST_USER: EmailStr = "test@example.com"
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
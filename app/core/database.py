@@ -1,10 +1,251 @@
+import functools
+import os
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 from sqlmodel import Session, create_engine, select
 
-from app import crud
+from app import crud, stats
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
+from app.core.lookups import lookups
+from app.core.text import unaccent
 from app.models import User, UserCreate, Rol, RolEnum, Estado, EstadoEnum
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+class PoolMetrics:
+    """Counts checkouts and time spent waiting for a pooled connection."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def pool_class(self, base: type[QueuePool]) -> type[QueuePool]:
+        metrics = self
+
+        class InstrumentedPool(base):
+            def _do_get(self):
+                start = time.perf_counter()
+                try:
+                    record = super()._do_get()
+                except PoolTimeoutError:
+                    metrics.timeouts += 1
+                    raise
+                finally:
+                    waited = time.perf_counter() - start
+                    metrics.wait_seconds_total += waited
+                    metrics.wait_seconds_max = max(metrics.wait_seconds_max, waited)
+                metrics.checkouts += 1
+                return record
+
+        return InstrumentedPool
+
+    def snapshot(self, pool: Pool) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        return stats
+
+
+def pool_limits(is_async: bool) -> tuple[int, int]:
+    """(pool_size, max_overflow) of one engine in this worker process."""
+    budget = settings.db_connections_per_worker
+    if budget is None:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    if settings.DB_ASYNC:
+        # The routers run on the async engine, the sync one only serves the odd helper
+        budget = budget - 1 if is_async else 1
+    pool_size = min(settings.DB_POOL_SIZE, budget)
+    return pool_size, budget - pool_size
+
+
+def engine_options(pool_class: type[QueuePool], metrics: PoolMetrics, is_async: bool) -> dict[str, Any]:
+    pool_size, max_overflow = pool_limits(is_async)
+    options: dict[str, Any] = {
+        "poolclass": metrics.pool_class(pool_class),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.database_url.startswith("sqlite"):
+        # Local stand-in: the pooled connections are shared with the event loop thread
+        options["connect_args"] = {"check_same_thread": False}
+    elif settings.DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def _register_sqlite_functions(dbapi_connection: Any, connection_record: Any) -> None:
+    # Stand-in for the f_unaccent() SQL function the search migration creates on Postgres
+    dbapi_connection.create_function("f_unaccent", 1, unaccent, deterministic=True)
+
+
+def register_functions(engine: Engine) -> None:
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _register_sqlite_functions)
+
+
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+_engines_pid = os.getpid()
+
+
+@functools.cache
+def get_engine() -> Engine:
+    """The sync engine, built on first use so importing the app doesn't load the driver."""
+    global _engines_pid
+    engine = create_engine(settings.database_url, **engine_options(QueuePool, pool_metrics, is_async=False))
+    _engines_pid = os.getpid()
+    instrument_engine(engine)
+    register_functions(engine)
+    return engine
+
+
+@functools.cache
+def get_async_engine() -> AsyncEngine | None:
+    """The async engine the routers use with DB_ASYNC, otherwise None."""
+    global _engines_pid
+    if not settings.DB_ASYNC:
+        return None
+    # psycopg 3 serves both modes from the same postgresql+psycopg URL
+    engine = create_async_engine(
+        settings.database_url, **engine_options(AsyncAdaptedQueuePool, async_pool_metrics, is_async=True)
+    )
+    _engines_pid = os.getpid()
+    instrument_engine(engine.sync_engine)
+    register_functions(engine.sync_engine)
+    return engine
+
+
+def _built(accessor: Any) -> Any:
+    """The accessor's engine if this process already built it, without building it."""
+    return accessor() if accessor.cache_info().currsize else None
+
+
+# Session-level, so operadora_stats follows guia writes from the API, jobs and CLIs alike
+stats.register_listeners()
+
+
+def reset_pools() -> None:
+    """Forget pooled connections inherited from a parent process, e.g. under
+    gunicorn --preload, without closing them for the parent."""
+    if os.getpid() == _engines_pid:
+        return
+    engine, async_engine = _built(get_engine), _built(get_async_engine)
+    if engine is not None:
+        engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+
+async def warm_pools(count: int) -> None:
+    """Open up to ``count`` connections of the engine the routers use and keep
+    them pooled, so the first requests skip the connect."""
+    async_engine = get_async_engine()
+    count = min(count, pool_limits(async_engine is not None)[0])
+    if async_engine is not None:
+        connections = [await async_engine.connect() for _ in range(count)]
+        for connection in connections:
+            await connection.close()
+    else:
+        engine = get_engine()
+        connections = [engine.connect() for _ in range(count)]
+        for connection in connections:
+            connection.close()
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection and drop the engines; run last on shutdown.
+
+    The next get_engine()/get_async_engine() builds new ones, e.g. when the
+    app is started again in the same process.
+    """
+    engine, async_engine = _built(get_engine), _built(get_async_engine)
+    if engine is not None:
+        engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    get_engine.cache_clear()
+    get_async_engine.cache_clear()
+
+
+def get_pool_metrics() -> dict[str, Any]:
+    metrics = {}
+    engine, async_engine = _built(get_engine), _built(get_async_engine)
+    if engine is not None:
+        metrics["sync"] = pool_metrics.snapshot(engine.pool)
+    if async_engine is not None:
+        metrics["async"] = async_pool_metrics.snapshot(async_engine.sync_engine.pool)
+    return metrics
+
+
+class SyncSessionAdapter:
+    """Awaitable facade over a sync Session used when DB_ASYNC is off.
+
+    Mirrors the subset of the sqlmodel AsyncSession API used by the routers so
+    both engine modes share one code path; calls still block the event loop,
+    which is exactly the behaviour the async mode is measured against.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances: Any) -> None:
+        self.sync_session.add_all(instances)
+
+    def expunge(self, instance: Any) -> None:
+        self.sync_session.expunge(instance)
+
+    async def exec(self, statement: Any, **kwargs: Any) -> Any:
+        return self.sync_session.exec(statement, **kwargs)
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        return self.sync_session.execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        return self.sync_session.scalar(statement, *args, **kwargs)
+
+    async def get(self, entity: Any, ident: Any, **kwargs: Any) -> Any:
+        return self.sync_session.get(entity, ident, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        self.sync_session.delete(instance)
+
+    async def flush(self) -> None:
+        self.sync_session.flush()
+
+    async def commit(self) -> None:
+        self.sync_session.commit()
+
+    async def rollback(self) -> None:
+        self.sync_session.rollback()
+
+    async def refresh(self, instance: Any, attribute_names: Any = None) -> None:
+        self.sync_session.refresh(instance, attribute_names=attribute_names)
+
+    async def close(self) -> None:
+        self.sync_session.close()
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -19,32 +260,27 @@ def init_db(session: Session) -> None:
     # from sqlmodel import SQLModel
 
     # This works because the models are already imported and registered from app.models
-    # SQLModel.metadata.create_all(engine)
+    # SQLModel.metadata.create_all(get_engine())
 
     user = session.exec(
         select(User).where(User.email == settings.FIRST_SUPERUSER)
     ).first()
     if not user:
-        rol_admin = Rol(rol=RolEnum.ADMIN)
-        rol_user = Rol(rol=RolEnum.USER)
-        rol_guest = Rol(rol=RolEnum.GUEST)
-        estado_activo=Estado(estado=EstadoEnum.ACTIVE)
-        estado_inactivo=Estado(estado=EstadoEnum.INACTIVE)
-        session.add(rol_admin)
-        session.add(rol_user)
-        session.add(rol_guest)
-        session.add(estado_activo)
-        session.add(estado_inactivo)
+        # Rows are matched by enum value, whatever ids they end up with
+        roles = set(session.exec(select(Rol.rol)).all())
+        session.add_all(Rol(rol=rol) for rol in RolEnum if rol not in roles)
+        estados = set(session.exec(select(Estado.estado)).all())
+        session.add_all(Estado(estado=estado) for estado in EstadoEnum if estado not in estados)
         session.commit()
-        session.close()
+        lookups.load_sync(session)
         user_in = UserCreate(
             nombre="Admin",
             apellido="Admin",
             email=settings.FIRST_SUPERUSER,
             password=settings.FIRST_SUPERUSER_PASSWORD,
             is_superuser=True,
-            rol_id=1,
-            estado_id=1,
+            rol_id=lookups.rol_id(RolEnum.ADMIN),
+            estado_id=lookups.estado_id(EstadoEnum.ACTIVE),
             cedula="0000000000"
         )
         user = crud.create_user(session=session, user_create=user_in)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import functools
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "email-templates"
+
+
+@functools.cache
+def _templates() -> Any:
+    # jinja2 is only imported once the first email is rendered
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    return Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=select_autoescape())
+
+
+class EmailNotSent(Exception):
+    pass
+
+
+def render_email_template(template_name: str, context: dict[str, Any]) -> str:
+    return _templates().get_template(template_name).render(context)
+
+
+def send_email(*, email_to: str, subject: str, html_content: str) -> None:
+    """Blocking SMTP send; raises EmailNotSent so job retries can kick in."""
+    if not settings.emails_enabled:
+        raise EmailNotSent("SMTP no está configurado")
+    import emails  # Only workers that actually send mail pay for the import
+
+    message = emails.Message(
+        subject=subject, html=html_content, mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL)
+    )
+    smtp_options: dict[str, Any] = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
+    if settings.SMTP_TLS:
+        smtp_options["tls"] = True
+    elif settings.SMTP_SSL:
+        smtp_options["ssl"] = True
+    if settings.SMTP_USER:
+        smtp_options["user"] = settings.SMTP_USER
+    if settings.SMTP_PASSWORD:
+        smtp_options["password"] = settings.SMTP_PASSWORD
+    response = message.send(to=email_to, smtp=smtp_options)
+    if response.status_code != 250:
+        # Connection failures come back as response.error instead of a status code
+        detail = repr(response.error) if response.error else f"SMTP {response.status_code}: {response.status_text}"
+        raise EmailNotSent(detail)
+
+
+def new_account_email(*, email_to: str, nombre: str | None) -> tuple[str, str]:
+    subject = f"{settings.PROJECT_NAME} - Cuenta creada"
+    html_content = render_email_template(
+        "new_account.html",
+        {"project_name": settings.PROJECT_NAME, "nombre": nombre or email_to, "email": email_to,
+         "link": settings.FRONTEND_HOST},
+    )
+    return subject, html_content
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.slow_query")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> RequestStats | None:
+    return _request_stats.get()
+
+
+def _format_labels(pairs: Iterable[tuple[str, object]]) -> str:
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def samples(self, name: str, label_names: tuple[str, ...]) -> list[str]:
+        lines = []
+        with self._lock:
+            for labels, (counts, count, total) in sorted(self._series.items()):
+                pairs = list(zip(label_names, labels))
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{name}_bucket{_format_labels([*pairs, ('le', bound)])} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels([*pairs, ('le', '+Inf')])} {count}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {count}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {total}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.request_latency = Histogram()
+        self.request_queries = Histogram(buckets=(1, 2, 3, 5, 10, 25, 50, 100))
+        self.db_queries_total = 0
+        self.db_seconds_total = 0.0
+        self.slow_queries_total = 0
+        self.requests_by_status: dict[tuple, int] = defaultdict(int)
+
+
+metrics = Metrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.db_queries_total += 1
+    metrics.db_seconds_total += elapsed
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        metrics.slow_queries_total += 1
+        logger.warning("slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class InstrumentationMiddleware:
+    """Per-route latency and DB time, reported as metrics and a Server-Timing header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    timing = (
+                        f"app;dur={elapsed_ms:.1f}, "
+                        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            labels = (scope["method"], path)
+            metrics.request_latency.observe(labels, time.perf_counter() - start)
+            metrics.request_queries.observe(labels, stats.queries)
+            metrics.requests_by_status[(*labels, str(status_code))] += 1
+
+
+def render_prometheus(gauges: dict[str, float]) -> str:
+    lines = [
+        "# TYPE http_request_duration_seconds histogram",
+        *metrics.request_latency.samples("http_request_duration_seconds", ("method", "route")),
+        "# TYPE http_request_db_queries histogram",
+        *metrics.request_queries.samples("http_request_db_queries", ("method", "route")),
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(metrics.requests_by_status.items()):
+        labels = _format_labels([("method", method), ("route", route), ("status", status)])
+        lines.append(f"http_requests_total{labels} {count}")
+    lines += [
+        "# TYPE db_queries_total counter",
+        f"db_queries_total {metrics.db_queries_total}",
+        "# TYPE db_query_seconds_total counter",
+        f"db_query_seconds_total {metrics.db_seconds_total}",
+        "# TYPE db_slow_queries_total counter",
+        f"db_slow_queries_total {metrics.slow_queries_total}",
+    ]
+    for name, value in gauges.items():
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,74 @@
+import datetime
+import logging
+from typing import Any
+
+from sqlmodel import Session, select
+
+from app.models import Estado, EstadoEnum, Rol, RolEnum
+
+logger = logging.getLogger(__name__)
+
+
+class LookupNotLoaded(LookupError):
+    pass
+
+
+class Lookups:
+    """Ids of the ``rol`` and ``estado`` rows by enum value.
+
+    Both tables are tiny and only change through init_db, so authorization
+    checks compare ids against this per-process copy instead of joining or
+    lazy loading them. ``load`` replaces both maps at once; run it at startup
+    and again after editing the tables (SIGHUP or POST /lookups/refresh).
+    """
+
+    def __init__(self):
+        self.roles: dict[RolEnum, int] = {}
+        self.estados: dict[EstadoEnum, int] = {}
+        self.loaded_date: datetime.datetime | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_date is not None
+
+    def _set(self, roles: list[tuple[int, RolEnum]], estados: list[tuple[int, EstadoEnum]]) -> None:
+        self.roles = {rol: id for id, rol in roles}
+        self.estados = {estado: id for id, estado in estados}
+        self.loaded_date = datetime.datetime.now()
+        logger.info("Loaded %d roles and %d estados", len(self.roles), len(self.estados))
+
+    async def load(self, session: Any) -> None:
+        roles = (await session.exec(select(Rol.id, Rol.rol))).all()
+        estados = (await session.exec(select(Estado.id, Estado.estado))).all()
+        self._set(roles, estados)
+
+    def load_sync(self, session: Session) -> None:
+        self._set(session.exec(select(Rol.id, Rol.rol)).all(), session.exec(select(Estado.id, Estado.estado)).all())
+
+    def rol_id(self, rol: RolEnum) -> int:
+        try:
+            return self.roles[rol]
+        except KeyError:
+            raise LookupNotLoaded(f"No rol {rol.value}; run init_db and refresh the lookups") from None
+
+    def estado_id(self, estado: EstadoEnum) -> int:
+        try:
+            return self.estados[estado]
+        except KeyError:
+            raise LookupNotLoaded(f"No estado {estado.value}; run init_db and refresh the lookups") from None
+
+    def is_active(self, estado_id: int | None) -> bool:
+        return estado_id != self.estado_id(EstadoEnum.INACTIVE)
+
+    def has_rol(self, rol_id: int | None, rol: RolEnum) -> bool:
+        return rol_id == self.rol_id(rol)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "roles": {rol.value: id for rol, id in self.roles.items()},
+            "estados": {estado.value: id for estado, id in self.estados.items()},
+            "loaded_date": self.loaded_date,
+        }
+
+
+lookups = Lookups()
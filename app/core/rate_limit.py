@@ -0,0 +1,144 @@
+import time
+from typing import Any, Protocol
+
+from app.core.cache import RedisBackend, TTLCache
+from app.core.config import settings
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Rate limit exceeded")
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+def _window_count(previous: int, current: int, now: float, window: float) -> float:
+    # Sliding window approximated from two fixed windows: the previous one counts
+    # for the fraction of it the sliding window still overlaps
+    return previous * (1 - (now % window) / window) + current
+
+
+class SlidingWindowBackend(Protocol):
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """Count an attempt for ``key``; 0 when allowed, otherwise seconds to wait."""
+        ...
+
+    async def close(self) -> None: ...
+
+
+class MemorySlidingWindow:
+    """Counters of this worker process only."""
+
+    def __init__(self, maxsize: int):
+        self.windows = TTLCache(maxsize=maxsize, ttl=0)
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = time.time()
+        index = int(now // window)
+        previous = current = 0
+        entry = self.windows.get(key)
+        if entry is not None:
+            entry_index, entry_previous, entry_current = entry
+            if entry_index == index:
+                previous, current = entry_previous, entry_current
+            elif entry_index == index - 1:
+                previous = entry_current
+        current += 1
+        self.windows.set(key, (index, previous, current), ttl=2 * window)
+        if _window_count(previous, current, now, window) > limit:
+            return window - now % window
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisSlidingWindow:
+    """Counters shared by every worker: one INCR'd key per fixed window."""
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = time.time()
+        index = int(now // window)
+        current_key = f"ratelimit:{key}:{index}"
+        current = await self.client.incr(current_key)
+        if current == 1:
+            await self.client.expire(current_key, int(2 * window) + 1)
+        previous = int(await self.client.get(f"ratelimit:{key}:{index - 1}") or 0)
+        if _window_count(previous, current, now, window) > limit:
+            return window - now % window
+        return 0
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``capacity``; per process, like the CPU it protects."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class LoginRateLimiter:
+    """Rejects login attempts before they reach the database or bcrypt.
+
+    Every attempt counts against the client IP and the email it targets. Only
+    attempts that pass both consume a token from the global bucket.
+    """
+
+    def __init__(self, windows: SlidingWindowBackend, bucket: TokenBucket):
+        self.windows = windows
+        self.bucket = bucket
+        self.rejected = {"ip": 0, "email": 0, "global": 0}
+
+    async def check(self, ip: str, email: str) -> None:
+        limits = [
+            ("ip", f"login:ip:{ip}", settings.LOGIN_IP_LIMIT, settings.LOGIN_IP_WINDOW_SECONDS),
+            ("email", f"login:email:{email.strip().lower()}",
+             settings.LOGIN_EMAIL_LIMIT, settings.LOGIN_EMAIL_WINDOW_SECONDS),
+        ]
+        for scope, key, limit, window in limits:
+            retry_after = await self.windows.hit(key, limit, window)
+            if retry_after:
+                self.rejected[scope] += 1
+                raise RateLimited(retry_after)
+        retry_after = self.bucket.take()
+        if retry_after:
+            self.rejected["global"] += 1
+            raise RateLimited(retry_after)
+
+    async def close(self) -> None:
+        await self.windows.close()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "rejected_ip": self.rejected["ip"],
+            "rejected_email": self.rejected["email"],
+            "rejected_global": self.rejected["global"],
+            "global_tokens": self.bucket.tokens,
+        }
+
+
+def _windows() -> SlidingWindowBackend:
+    if settings.LOGIN_RATE_LIMIT_BACKEND == "redis":
+        return RedisSlidingWindow(RedisBackend(settings.REDIS_URL).client)
+    return MemorySlidingWindow(maxsize=100_000)
+
+
+login_limiter = LoginRateLimiter(
+    _windows(), TokenBucket(settings.LOGIN_GLOBAL_RATE_PER_SECOND, settings.LOGIN_GLOBAL_BURST)
+)
@@ -1,12 +1,21 @@
+import asyncio
+import functools
+import secrets
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable
 import jwt
 
 from app.core.config import settings
 
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@functools.cache
+def pwd_context() -> Any:
+    # Built on first use, so importing the app doesn't load passlib and its bcrypt backend
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 SECRET_KEY = str(settings.SECRET_KEY)
 ALGORITHM = "HS256"
@@ -25,8 +34,117 @@ def create_access_token(data: dict | Any, expires_delta: timedelta | None = None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
+
+
+@functools.cache
+def _dummy_hash() -> str:
+    return pwd_context().hash(secrets.token_urlsafe(32))
+
+
+def verify_dummy_password(plain_password: str) -> bool:
+    """Full-cost verify against a throwaway hash, so unknown emails take as long
+    as wrong passwords and can't be enumerated by timing."""
+    pwd_context().verify(plain_password, _dummy_hash())
+    return False
+
+
+class PasswordHashingBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """Bounded executor for bcrypt work so it never runs on the event loop."""
+
+    def __init__(self, kind: str, workers: int, queue_limit: int, retry_after: int):
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+        self._executor: Executor | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise PasswordHashingBusy(retry_after=self.retry_after)
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+            "max_latency_seconds": self.max_seconds,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def verify_dummy_password_async(plain_password: str) -> bool:
+    return await hashing_pool.run(verify_dummy_password, plain_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(get_password_hash, password)
+
+
+async def hash_passwords_async(passwords: list[str]) -> list[str]:
+    # Keep at most one job per worker queued so batches don't starve other requests
+    semaphore = asyncio.Semaphore(hashing_pool.workers)
+
+    async def hash_one(password: str) -> str:
+        async with semaphore:
+            return await hash_password_async(password)
+
+    return await asyncio.gather(*(hash_one(password) for password in passwords))
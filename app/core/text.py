@@ -0,0 +1,9 @@
+import unicodedata
+
+
+def unaccent(value: str | None) -> str | None:
+    """Strip diacritics the way Postgres' unaccent does for Spanish text (á -> a, ñ -> n)."""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
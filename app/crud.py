@@ -1,6 +1,11 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from app.models import User, UserCreate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import (
+    get_password_hash, verify_dummy_password, verify_dummy_password_async, verify_password, verify_password_async,
+    hash_password_async
+)
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -21,7 +26,34 @@ def get_user_by_email(*, session: Session, email: str) -> User | None:
 def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
+        verify_dummy_password(password)
         return None
     if not verify_password(password, db_user.hashed_password):
         return None
     return db_user
+
+
+# Async variants, used by the routers through AsyncSessionDep
+async def create_user_async(*, session: AsyncSession, user_create: UserCreate) -> User:
+    hashed_password = await hash_password_async(user_create.password)
+    db_obj = User.model_validate(user_create, update={"hashed_password": hashed_password})
+    session.add(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
+    return db_obj
+
+
+async def get_user_by_email_async(*, session: AsyncSession, email: str) -> User | None:
+    statement = select(User).where(User.email == email)
+    session_user = (await session.exec(statement)).first()
+    return session_user
+
+
+async def authenticate_async(*, session: AsyncSession, email: str, password: str) -> User | None:
+    db_user = await get_user_by_email_async(session=session, email=email)
+    if not db_user:
+        await verify_dummy_password_async(password)
+        return None
+    if not await verify_password_async(password, db_user.hashed_password):
+        return None
+    return db_user
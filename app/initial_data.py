@@ -1,8 +1,10 @@
+import argparse
 import logging
 
 from sqlmodel import Session
 
-from app.core.database import engine, init_db
+from app.core.database import get_engine, init_db
+from app.seeders.engine import BATCH_SIZE
 from app.seeders.guia import create_guias
 from app.seeders.operadora import create_operadoras
 from app.seeders.users import create_user
@@ -12,18 +14,33 @@ logger = logging.getLogger(__name__)
 
 
 def init() -> None:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         init_db(session)
 
 
-def main() -> None:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Create the initial data and optional load-test fixtures")
+    parser.add_argument("--users", type=int, default=10, help="users to generate")
+    parser.add_argument("--operadoras", type=int, default=10, help="operadoras to generate")
+    parser.add_argument("--guias", type=int, default=5, help="guias to generate (capped by free users)")
+    parser.add_argument("--workers", type=int, default=None, help="Faker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per COPY/INSERT batch")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
     logger.info("Creating initial data")
     init()
-    create_user()
-    create_operadoras()
-    create_guias()
-    logger.info("Initial data created")
+    reports = [
+        create_user(args.users, workers=args.workers, batch_size=args.batch_size),
+        create_operadoras(args.operadoras, workers=args.workers, batch_size=args.batch_size),
+        create_guias(args.guias, batch_size=args.batch_size),
+    ]
+    rows = sum(report.rows for report in reports)
+    seconds = sum(report.seconds for report in reports)
+    logger.info("Initial data created: %d rows in %.2fs (%.0f rows/s)", rows, seconds, rows / seconds if seconds else 0)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,30 +1,134 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import signal
+from contextlib import asynccontextmanager, suppress
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.api.deps import refresh_lookups
+from app.api.jobs import job_queue
 from app.api.main import api_router
+from app.api.response_cache import response_cache
+from app.api.routes.metrics import prometheus_router
+from app.core.database import dispose_engines, reset_pools, warm_pools
+from app.core.instrumentation import InstrumentationMiddleware
+from app.core.rate_limit import RateLimited, login_limiter
+from app.core.security import PasswordHashingBusy, hashing_pool
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    generate_unique_id_function=custom_generate_unique_id,
-)
+if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
+    # Imported only when enabled: sentry_sdk and its integrations are the slowest import of the app
+    import sentry_sdk
+
+    sentry_sdk.init(dsn=str(settings.SENTRY_DSN), traces_sample_rate=settings.SENTRY_TRACES_SAMPLE_RATE)
+
+logger = logging.getLogger(__name__)
+
+
+async def _load_lookups() -> None:
+    try:
+        await refresh_lookups()
+    except Exception:
+        # The first authorized request retries
+        logger.exception("Loading the rol/estado lookups failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker resources: opened before the worker serves its first request
+    and released once the server has drained the in-flight ones.
+
+    The engines are built here, by the pool warm-up, and dropped by
+    dispose_engines, so each worker and each app run gets its own.
+    """
+    reset_pools()
+    try:
+        await warm_pools(settings.DB_POOL_WARM_CONNECTIONS)
+    except Exception:
+        logger.exception("Warming the database pool failed")
+    await _load_lookups()
+    loop = asyncio.get_running_loop()
+    # Only the main thread of a Unix process can install signal handlers
+    with suppress(NotImplementedError, RuntimeError, ValueError, AttributeError):
+        loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(_load_lookups()))
+    # Picks up queued database jobs at startup; otherwise the first enqueue starts it
+    job_queue.start()
+    yield
+    with suppress(NotImplementedError, RuntimeError, ValueError, AttributeError):
+        loop.remove_signal_handler(signal.SIGHUP)
+    await job_queue.stop(timeout=settings.JOBS_SHUTDOWN_TIMEOUT_SECONDS)
+    await run_in_threadpool(hashing_pool.shutdown)
+    await response_cache.close()
+    await login_limiter.close()
+    # Last, since the jobs above may still have been writing
+    await dispose_engines()
+
+
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, intente nuevamente"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Demasiados intentos, intente más tarde"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
-if settings.all_cors_origins:
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=settings.all_cors_origins,
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
+def create_app() -> FastAPI:
+    """Build the ASGI app; ``python -m app.server`` runs it, see app/server.py."""
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        generate_unique_id_function=custom_generate_unique_id,
+        lifespan=lifespan,
     )
 
-app.include_router(api_router, prefix=settings.API_V1_STR)
+    if settings.all_cors_origins:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=settings.all_cors_origins,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+    # Added last so it wraps CORS too and times the whole request
+    app.add_middleware(InstrumentationMiddleware)
+
+    app.add_exception_handler(PasswordHashingBusy, password_hashing_busy_handler)
+    app.add_exception_handler(RateLimited, rate_limited_handler)
+
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    if settings.METRICS_ENABLED:
+        app.include_router(prometheus_router)
+    return app
+
+
+def __getattr__(name: str) -> Any:
+    # ``app.main:app`` (uvicorn without --factory, fastapi dev, the benchmarks) builds the app on
+    # first access, so factory mode doesn't construct a second, unused one per worker
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # class LoginRequest(BaseModel):
 #     email: str
 #     password: str
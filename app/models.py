@@ -1,10 +1,11 @@
 import datetime
 import uuid
 from enum import StrEnum
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import EmailStr, BaseModel
-from sqlmodel import Field, SQLModel, Column, Enum, Relationship, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Field, SQLModel, Column, Enum, Relationship, JSON, Index
 
 
 class RolEnum(StrEnum):
@@ -32,6 +33,8 @@ class Estado(SQLModel, table=True):
 
 
 class User(SQLModel, table=True):
+    __table_args__ = (Index("ix_user_created_date_id", "created_date", "id"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     rol_id: int | None = Field(foreign_key="rol.id")
     estado_id: int | None = Field(foreign_key="estado.id")
@@ -87,6 +90,19 @@ class UserPublic(BaseModel):
     apellido: str | None
 
 
+class UserOut(BaseModel):
+    id: uuid.UUID
+    rol_id: int | None
+    estado_id: int | None
+    cedula: str
+    nombre: str | None
+    apellido: str | None
+    telefono: str | None
+    email: EmailStr
+    created_date: datetime.datetime
+    updated_date: datetime.datetime | None
+
+
 class UserUpdate(SQLModel):
     email: EmailStr | None = None
     nombre: str | None = None
@@ -96,7 +112,13 @@ class UserUpdate(SQLModel):
     estado_id: int | None = None
 
 
+class UserBulkUpdate(UserUpdate):
+    id: uuid.UUID
+
+
 class Operadora(SQLModel, table=True):
+    __table_args__ = (Index("ix_operadora_created_date_id", "created_date", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     nombre: str = Field(max_length=100)
     razon_social: str = Field(max_length=150)
@@ -134,6 +156,10 @@ class OperadoraUpdate(SQLModel):
     direccion: str | None = None
 
 
+class OperadoraBulkUpdate(OperadoraUpdate):
+    id: int
+
+
 class OperadoraOut(OperadoraCreate):
     id: int
     created_date: datetime.datetime
@@ -143,11 +169,21 @@ class OperadoraOut(OperadoraCreate):
 
 
 class Guia(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_guia_created_date_id", "created_date", "id"),
+        Index("ix_guia_id_operadora_calificacion", "id_operadora", "calificacion"),
+        Index("ix_guia_calificacion", "calificacion"),
+        Index("ix_guia_idiomas", "idiomas", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     id_usuario: uuid.UUID | None = Field(unique=True,default=None, foreign_key="user.id")
     id_operadora: int | None = Field(default=None, foreign_key="operadora.id")
     calificacion: float | None = None
-    idiomas: list[str] | None = Field(default=None, sa_column=Column(JSON))
+    idiomas: list[str] | None = Field(
+        default=None,
+        sa_column=Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"))
+    )
     created_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
     updated_date: datetime.datetime | None = None
     id_usuario_created: uuid.UUID | None = Field(default=None, foreign_key="user.id")
@@ -180,12 +216,78 @@ class GuiaWithUser(SQLModel):
     id_usuario_created: uuid.UUID | None
     id_usuario_updated: uuid.UUID | None
 
+
+class OperadoraWithGuias(OperadoraOut):
+    # One page of the operadora's guias, see guias_offset/guias_limit
+    guias: list[GuiaWithUser]
+    guias_total: int
+
+
 class GuiaUpdate(SQLModel):
     id_operadora: int | None = None
     calificacion: float | None = None
     idiomas: list[str] | None = None
 
 
+class GuiaBulkUpdate(GuiaUpdate):
+    id: int
+
+
+# Per-operadora guia aggregates, maintained with every guia write by app.stats
+class OperadoraStats(SQLModel, table=True):
+    __tablename__ = "operadora_stats"
+
+    id_operadora: int = Field(primary_key=True, foreign_key="operadora.id", ondelete="CASCADE")
+    guias: int = 0
+    # Guias with a calificacion, the divisor of the average
+    calificaciones: int = 0
+    calificacion_sum: float = 0
+    updated_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
+
+
+class OperadoraIdiomaStats(SQLModel, table=True):
+    __tablename__ = "operadora_idioma_stats"
+
+    id_operadora: int = Field(primary_key=True, foreign_key="operadora.id", ondelete="CASCADE")
+    # Unbounded, like the guia.idiomas values it counts
+    idioma: str = Field(primary_key=True)
+    guias: int = 0
+
+
+class OperadoraStatsOut(BaseModel):
+    id_operadora: int
+    guias: int
+    calificacion_promedio: float | None
+    # Guias per language
+    idiomas: dict[str, int]
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+# Background job; only persisted with JOBS_BACKEND=database, otherwise kept in memory
+class Job(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_job_status_created_date", "status", "created_date"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    name: str = Field(max_length=100)
+    payload: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    status: JobStatus = JobStatus.QUEUED
+    attempts: int = 0
+    progress: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    result: Any = Field(default=None, sa_column=Column(JSON))
+    error: str | None = None
+    created_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    started_date: datetime.datetime | None = None
+    finished_date: datetime.datetime | None = None
+
+
 # Contents of JWT token
 class Token(SQLModel):
     access_token: str
@@ -198,3 +300,14 @@ class TokenPayload(SQLModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+    user_id: uuid.UUID | None = None
+
+
+# Authenticated user as seen by the API dependencies (cached between requests)
+class Principal(BaseModel):
+    id: uuid.UUID
+    email: EmailStr
+    nombre: str | None
+    apellido: str | None
+    rol_id: int | None
+    estado_id: int | None
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from faker import Faker
+from sqlalchemy import JSON, Engine, insert
+from sqlmodel import Session, SQLModel, select
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5_000
+# Digits of the row index in fixed-width unique fields, e.g. the 10 character cedula "13" + 8 digits
+INDEX_WIDTH = 8
+
+RowFactory = Callable[[int, int], list[dict[str, Any]]]
+
+_fake: Faker | None = None
+
+
+def faker(seed_value: int) -> Faker:
+    # One Faker per worker process, reseeded per batch so runs are reproducible
+    global _fake
+    if _fake is None:
+        _fake = Faker()
+    _fake.seed_instance(seed_value)
+    return _fake
+
+
+def index_offset(session: Session, column: Any, prefix: str, count: int) -> int:
+    """First free row index for ``count`` rows whose ``column`` is ``{prefix}{index:08d}``.
+
+    It's one past the highest such value stored, rather than the row count, so
+    a re-run never reuses an index after deletes or rows created through the API.
+    """
+    values = session.exec(
+        select(column).where(column.like(prefix + "_" * INDEX_WIDTH)).order_by(column.desc()).limit(100)
+    )
+    offset = next((int(value[len(prefix):]) + 1 for value in values if value[len(prefix):].isdigit()), 0)
+    if offset + count > 10 ** INDEX_WIDTH:
+        raise ValueError(f"{column} has no room for {count} more {prefix}{'N' * INDEX_WIDTH} values after {offset}")
+    return offset
+
+
+@dataclass
+class SeedReport:
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.table}: {self.rows} rows in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def generate(factory: RowFactory, count: int, workers: int | None = None,
+             batch_size: int = BATCH_SIZE) -> Iterator[list[dict[str, Any]]]:
+    """Yield ``count`` rows in batches, built by ``factory(start, stop)``.
+
+    Faker is slow enough to dominate large seeds, so batches are generated in a
+    process pool; factories derive unique fields from the row index, which keeps
+    them unique across workers without Faker's per-process ``unique`` proxy.
+    """
+    ranges = [(start, min(start + batch_size, count)) for start in range(0, count, batch_size)]
+    workers = workers or min(len(ranges), os.cpu_count() or 1)
+    if workers <= 1:
+        for start, stop in ranges:
+            yield factory(start, stop)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(factory, *zip(*ranges))
+
+
+def _copy_rows(engine: Engine, table: Any, rows: list[dict[str, Any]]) -> None:
+    columns = list(rows[0])
+    json_columns = {name for name in columns if isinstance(table.c[name].type, JSON)}
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            with cursor.copy(f'COPY "{table.name}" ({column_list}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(
+                        [json.dumps(row[name]) if name in json_columns else row[name] for name in columns]
+                    )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def write_rows(engine: Engine, model: type[SQLModel], rows: list[dict[str, Any]]) -> None:
+    """COPY into Postgres, multi-row INSERT elsewhere (e.g. the SQLite stand-in)."""
+    if not rows:
+        return
+    table = model.__table__  # type: ignore[attr-defined]
+    if engine.dialect.name == "postgresql":
+        _copy_rows(engine, table, rows)
+        return
+    with engine.begin() as connection:
+        connection.execute(insert(table), rows)
+
+
+def seed(engine: Engine, model: type[SQLModel], factory: RowFactory, count: int,
+         workers: int | None = None, batch_size: int = BATCH_SIZE) -> SeedReport:
+    start = time.perf_counter()
+    written = 0
+    for rows in generate(factory, count, workers=workers, batch_size=batch_size):
+        write_rows(engine, model, rows)
+        written += len(rows)
+        logger.debug("%s: %d/%d", model.__tablename__, written, count)
+    report = SeedReport(table=str(model.__tablename__), rows=written, seconds=time.perf_counter() - start)
+    logger.info(str(report))
+    return report
@@ -1,25 +1,53 @@
-import random
+import datetime
+import uuid
+from functools import partial
 
-from faker import Faker
 from sqlmodel import Session, select
 
-from app.core.database import engine
-from app.models import User, Guia, Operadora
-
-
-def create_guias():
-    fake = Faker()
-    with Session(engine) as session:
-        users = session.exec(select(User.id).offset(3).limit(5)).all()
-        for user in users:
-            guia = Guia(
-                id_usuario=user,
-                id_operadora=random.choice(session.exec(select(Operadora.id)).all()),
-                calificacion=fake.random_int(min=1, max=5),
-                idiomas=[fake.language_name(), fake.language_name(), fake.language_name()]
-            )
-            session.add(guia)
-            session.commit()
+from app.core.database import get_engine
+from app.core.lookups import lookups
+from app.models import User, Guia, Operadora, RolEnum
+from app.seeders.engine import BATCH_SIZE, SeedReport, faker, seed
+from app.stats import rebuild as rebuild_stats
+
+
+def guia_rows(start: int, stop: int, *, user_ids: list[uuid.UUID], operadora_ids: list[int]) -> list[dict]:
+    fake = faker(start)
+    now = datetime.datetime.now()
+    return [
+        {
+            "id_usuario": user_ids[index],
+            "id_operadora": fake.random.choice(operadora_ids),
+            "calificacion": fake.random_int(min=1, max=5),
+            "idiomas": [fake.language_name(), fake.language_name(), fake.language_name()],
+            "created_date": now,
+            "updated_date": None,
+            "id_usuario_created": None,
+            "id_usuario_updated": None,
+        }
+        for index in range(start, stop)
+    ]
+
+
+def create_guias(count: int = 5, batch_size: int = BATCH_SIZE) -> SeedReport:
+    with Session(get_engine()) as session:
+        lookups.load_sync(session)
+        # Guias need a regular user that isn't a guia yet; both id lists load once
+        already_guia = select(Guia.id_usuario).where(Guia.id_usuario.is_not(None))
+        user_ids = list(session.exec(
+            select(User.id).where(User.rol_id == lookups.rol_id(RolEnum.USER), User.id.not_in(already_guia)).limit(count)
+        ).all())
+        operadora_ids = list(session.exec(select(Operadora.id)).all())
+    if not operadora_ids:
+        user_ids = []
+    factory = partial(guia_rows, user_ids=user_ids, operadora_ids=operadora_ids)
+    # The id lists are bound to the factory, so generate in-process instead of pickling them per batch
+    report = seed(get_engine(), Guia, factory, len(user_ids), workers=1, batch_size=batch_size)
+    # COPY bypasses the ORM events that keep operadora_stats up to date
+    with Session(get_engine()) as session:
+        rebuild_stats(session)
+        session.commit()
+    return report
 
 
 def main():
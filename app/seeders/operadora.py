@@ -1,27 +1,46 @@
-from faker.proxy import Faker
+import datetime
+import re
+from functools import partial
+
 from sqlmodel import Session
 
-from app.core.database import engine
+from app.core.database import get_engine
 from app.models import Operadora
+from app.seeders.engine import BATCH_SIZE, SeedReport, faker, index_offset, seed
+
+
+def operadora_rows(start: int, stop: int, *, offset: int) -> list[dict]:
+    fake = faker(start)
+    now = datetime.datetime.now()
+    rows = []
+    for index in range(offset + start, offset + stop):
+        company = fake.company()[:100]
+        domain = re.sub(r"[^a-z0-9]", "", company.lower())[:40]
+        rows.append({
+            "nombre": company,
+            "razon_social": company,
+            "correo": f"contacto{index}@{domain}.com",
+            "telefono": f"09{index:08d}",
+            "direccion": fake.address().replace("\n", ", ")[:100],
+            "created_date": now,
+            "updated_date": None,
+            "id_usuario_created": None,
+            "id_usuario_updated": None,
+        })
+    return rows
 
 
-def create_operadoras():
-    fake = Faker()
-    with Session(engine) as session:
-        for _ in range(10):
-            company=fake.company()
-            operadora=Operadora(
-                nombre=company,
-                razon_social=company,
-                correo=fake.company_email(),
-                telefono=fake.unique.numerify("09########"),
-                direccion= fake.address()
-            )
-            session.add(operadora)
-            session.commit()
+def create_operadoras(count: int = 10, workers: int | None = None, batch_size: int = BATCH_SIZE) -> SeedReport:
+    with Session(get_engine()) as session:
+        # correo is numbered with the same index
+        offset = index_offset(session, Operadora.telefono, "09", count)
+    factory = partial(operadora_rows, offset=offset)
+    return seed(get_engine(), Operadora, factory, count, workers=workers, batch_size=batch_size)
+
 
 def main():
     create_operadoras()
 
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,35 @@
+"""Production entry point: WEB_CONCURRENCY uvicorn worker processes.
+
+    WEB_CONCURRENCY=4 DB_MAX_CONNECTIONS=100 python -m app.server
+
+Every worker builds its own app with app.main:create_app. The lifespan then
+sizes that worker's pools to its share of DB_MAX_CONNECTIONS (APP_INSTANCES
+servers with WEB_CONCURRENCY workers each), warms them, loads the lookups and
+starts the job queue. On SIGTERM a worker stops accepting connections, waits
+up to SHUTDOWN_DRAIN_SECONDS for in-flight requests, gives running jobs
+JOBS_SHUTDOWN_TIMEOUT_SECONDS and closes its connections.
+
+Under gunicorn the same factory works with the uvicorn-worker package:
+
+    gunicorn 'app.main:create_app()' -k uvicorn_worker.UvicornWorker \
+        -w $WEB_CONCURRENCY --graceful-timeout $SHUTDOWN_DRAIN_SECONDS
+"""
+import uvicorn
+
+from app.core.config import settings
+
+
+def main() -> None:
+    # The settings load here first, so a connection budget that doesn't fit fails before forking
+    uvicorn.run(
+        "app.main:create_app",
+        factory=True,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.WEB_CONCURRENCY,
+        timeout_graceful_shutdown=settings.SHUTDOWN_DRAIN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
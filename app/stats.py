@@ -0,0 +1,294 @@
+"""Per-operadora guia statistics kept in operadora_stats and operadora_idioma_stats.
+
+Every guia write adjusts the summary in its own transaction: ORM flushes
+through ``before_flush`` and ORM INSERT/UPDATE/DELETE statements, like the
+bulk ones of app.api.bulk, through ``do_orm_execute``. Writes that bypass
+the ORM, like the seeders' COPY, are followed by a rebuild.
+
+    python -m app.stats check
+    python -m app.stats rebuild
+"""
+import argparse
+import collections
+import datetime
+import logging
+import math
+import sys
+from typing import Any
+
+from sqlalchemy import Connection, Table, delete, event, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import ORMExecuteState, Session as ORMSession
+from sqlmodel import Session, select
+
+from app.models import Guia, OperadoraIdiomaStats, OperadoraStats, OperadoraStatsOut
+
+logger = logging.getLogger(__name__)
+
+GuiaState = tuple[int | None, float | None, list[str] | None]
+
+
+class UntrackedGuiaWrite(RuntimeError):
+    """A guia write whose effect on the summary can't be worked out."""
+
+
+class StatsDelta:
+    """Signed changes to the summary rows, per operadora and per (operadora, idioma)."""
+
+    def __init__(self):
+        # id_operadora -> [guias, calificaciones, calificacion_sum]
+        self.operadoras: dict[int, list[float]] = collections.defaultdict(lambda: [0, 0, 0.0])
+        self.idiomas: collections.Counter[tuple[int, str]] = collections.Counter()
+
+    def add(self, state: GuiaState, sign: int) -> None:
+        id_operadora, calificacion, idiomas = state
+        if id_operadora is None:
+            return
+        totals = self.operadoras[id_operadora]
+        totals[0] += sign
+        if calificacion is not None:
+            totals[1] += sign
+            totals[2] += sign * calificacion
+        for idioma in set(idiomas or ()):
+            self.idiomas[(id_operadora, idioma)] += sign
+
+    def __bool__(self) -> bool:
+        return bool(self.operadoras or self.idiomas)
+
+    def apply(self, connection: Connection) -> None:
+        now = datetime.datetime.now()
+        # Sorted so concurrent transactions lock the summary rows in the same order
+        operadoras = [
+            {"id_operadora": id_operadora, "guias": guias, "calificaciones": calificaciones,
+             "calificacion_sum": calificacion_sum, "updated_date": now}
+            for id_operadora, (guias, calificaciones, calificacion_sum) in sorted(self.operadoras.items())
+            if guias or calificaciones or calificacion_sum
+        ]
+        idiomas = [
+            {"id_operadora": id_operadora, "idioma": idioma, "guias": guias}
+            for (id_operadora, idioma), guias in sorted(self.idiomas.items())
+            if guias
+        ]
+        if operadoras:
+            statement = _upsert(connection, OperadoraStats.__table__, ["id_operadora"],
+                                ["guias", "calificaciones", "calificacion_sum"])
+            connection.execute(statement, operadoras)
+        if idiomas:
+            statement = _upsert(connection, OperadoraIdiomaStats.__table__, ["id_operadora", "idioma"], ["guias"])
+            connection.execute(statement, idiomas)
+
+
+def _upsert(connection: Connection, table: Table, keys: list[str], increments: list[str]) -> Any:
+    # INSERT ... ON CONFLICT DO UPDATE adds to the row atomically, no lock or read needed
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(table)
+    values = {name: table.c[name] + statement.excluded[name] for name in increments}
+    if "updated_date" in table.c:
+        values["updated_date"] = statement.excluded.updated_date
+    return statement.on_conflict_do_update(index_elements=keys, set_=values)
+
+
+def _state(guia: Guia) -> GuiaState:
+    return guia.id_operadora, guia.calificacion, guia.idiomas
+
+
+TRACKED = ("id_operadora", "calificacion", "idiomas")
+
+
+def _committed_state(guia: Guia) -> GuiaState:
+    attrs = inspect(guia).attrs
+
+    def committed(key: str) -> Any:
+        history = attrs[key].history
+        if history.deleted or history.unchanged:
+            return (history.deleted or history.unchanged)[0]
+        if not history.added:
+            # Expired, e.g. by a commit with expire_on_commit, and untouched: this loads the stored value
+            return getattr(guia, key)
+        # Set while expired, after active_history loaded an old value of None
+        return None
+
+    return tuple(committed(key) for key in TRACKED)
+
+
+def _load_old_value(target: Any, value: Any, oldvalue: Any, initiator: Any) -> None:
+    pass
+
+
+def _track_flush(session: ORMSession, flush_context: Any, instances: Any) -> None:
+    delta = StatsDelta()
+    for obj in session.new:
+        if isinstance(obj, Guia):
+            delta.add(_state(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Guia):
+            delta.add(_committed_state(obj), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Guia) and session.is_modified(obj):
+            delta.add(_committed_state(obj), -1)
+            delta.add(_state(obj), 1)
+    if delta:
+        delta.apply(session.connection())
+
+
+def _affected_rows(connection: Connection, statement: Any, parameters: Any) -> list[Any]:
+    """(id, *GuiaState) of the rows an UPDATE or DELETE on guia will touch, locked until commit."""
+    affected = select(Guia.id, Guia.id_operadora, Guia.calificacion, Guia.idiomas)
+    if isinstance(parameters, list):
+        # ORM bulk UPDATE by primary key: one parameter set per row, no WHERE clause
+        affected = affected.where(Guia.id.in_([row["id"] for row in parameters]))
+    if statement.whereclause is not None:
+        affected = affected.where(statement.whereclause)
+    if connection.dialect.name == "postgresql":
+        affected = affected.with_for_update()
+    return list(connection.execute(affected))
+
+
+def _track_statements(execute_state: ORMExecuteState) -> Any:
+    if not (execute_state.is_insert or execute_state.is_update or execute_state.is_delete):
+        return None
+    mapper = execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Guia:
+        return None
+    connection = execute_state.session.connection()
+    statement = execute_state.statement
+    parameters = execute_state.parameters
+    delta = StatsDelta()
+    result = None
+    if execute_state.is_insert:
+        if not parameters:
+            raise UntrackedGuiaWrite("INSERT into guia must pass its rows as parameters to keep operadora_stats")
+        for row in parameters if isinstance(parameters, list) else [parameters]:
+            delta.add((row.get("id_operadora"), row.get("calificacion"), row.get("idiomas")), 1)
+    elif execute_state.is_delete:
+        for row in _affected_rows(connection, statement, parameters):
+            delta.add(tuple(row[1:]), -1)
+    else:
+        # The new values can be SQL expressions, so read the rows back once the UPDATE ran
+        before = _affected_rows(connection, statement, parameters)
+        for row in before:
+            delta.add(tuple(row[1:]), -1)
+        result = execute_state.invoke_statement()
+        if before:
+            after = select(Guia.id_operadora, Guia.calificacion, Guia.idiomas).where(
+                Guia.id.in_([row.id for row in before])
+            )
+            for row in connection.execute(after):
+                delta.add(tuple(row), 1)
+    if delta:
+        delta.apply(connection)
+    return result
+
+
+def register_listeners() -> None:
+    """Track guia writes in every ORM session; app.core.database calls this on import."""
+    for identifier, listener in (("before_flush", _track_flush), ("do_orm_execute", _track_statements)):
+        if not event.contains(ORMSession, identifier, listener):
+            event.listen(ORMSession, identifier, listener)
+    for key in TRACKED:
+        # active_history loads an expired value before it's replaced, so the flush knows what to subtract
+        attribute = getattr(Guia, key)
+        if not event.contains(attribute, "set", _load_old_value):
+            event.listen(attribute, "set", _load_old_value, active_history=True)
+
+
+def aggregate(session: Session) -> StatsDelta:
+    """The summary computed from scratch by streaming the guia table."""
+    totals = StatsDelta()
+    rows = session.execute(
+        select(Guia.id_operadora, Guia.calificacion, Guia.idiomas)
+        .where(Guia.id_operadora.is_not(None))
+        .execution_options(yield_per=5000)
+    )
+    for row in rows:
+        totals.add(tuple(row), 1)
+    return totals
+
+
+def rebuild(session: Session) -> StatsDelta:
+    """Replace the summary with a full recount; the caller commits."""
+    if session.get_bind().dialect.name == "postgresql":
+        # Holds off guia writes until the rebuilt summary commits, so none is lost in between
+        session.execute(text("LOCK TABLE guia IN SHARE MODE"))
+    totals = aggregate(session)
+    session.execute(delete(OperadoraIdiomaStats))
+    session.execute(delete(OperadoraStats))
+    totals.apply(session.connection())
+    return totals
+
+
+def check(session: Session) -> list[str]:
+    """Differences between the stored summary and a full recount."""
+    expected = aggregate(session)
+    problems = []
+    stored = {row.id_operadora: row for row in session.exec(select(OperadoraStats))}
+    for id_operadora in sorted(set(expected.operadoras) | set(stored)):
+        guias, calificaciones, calificacion_sum = expected.operadoras.get(id_operadora, (0, 0, 0.0))
+        row = stored.get(id_operadora) or OperadoraStats(id_operadora=id_operadora)
+        if (row.guias, row.calificaciones) != (guias, calificaciones) or not math.isclose(
+                row.calificacion_sum, calificacion_sum, rel_tol=1e-9, abs_tol=1e-6):
+            problems.append(
+                f"operadora {id_operadora}: guias={row.guias} calificaciones={row.calificaciones} "
+                f"calificacion_sum={row.calificacion_sum}, expected {guias}/{calificaciones}/{calificacion_sum}"
+            )
+    stored_idiomas = {(row.id_operadora, row.idioma): row.guias for row in session.exec(select(OperadoraIdiomaStats))}
+    for key in sorted(set(expected.idiomas) | set(stored_idiomas)):
+        if stored_idiomas.get(key, 0) != expected.idiomas.get(key, 0):
+            problems.append(
+                f"operadora {key[0]} idioma {key[1]!r}: guias={stored_idiomas.get(key, 0)}, "
+                f"expected {expected.idiomas.get(key, 0)}"
+            )
+    return problems
+
+
+async def read_stats(session: Any, id_operadoras: list[int]) -> list[OperadoraStatsOut]:
+    """OperadoraStatsOut for each id, in order; zeros for operadoras without guias."""
+    if not id_operadoras:
+        return []
+    stored = {
+        row.id_operadora: row
+        for row in (await session.exec(select(OperadoraStats).where(OperadoraStats.id_operadora.in_(id_operadoras))))
+    }
+    idiomas: dict[int, dict[str, int]] = collections.defaultdict(dict)
+    rows = await session.exec(
+        select(OperadoraIdiomaStats)
+        .where(OperadoraIdiomaStats.id_operadora.in_(id_operadoras), OperadoraIdiomaStats.guias > 0)
+        .order_by(OperadoraIdiomaStats.id_operadora, OperadoraIdiomaStats.guias.desc(), OperadoraIdiomaStats.idioma)
+    )
+    for row in rows:
+        idiomas[row.id_operadora][row.idioma] = row.guias
+    stats = []
+    for id_operadora in id_operadoras:
+        row = stored.get(id_operadora) or OperadoraStats(id_operadora=id_operadora)
+        stats.append(OperadoraStatsOut(
+            id_operadora=id_operadora,
+            guias=row.guias,
+            calificacion_promedio=row.calificacion_sum / row.calificaciones if row.calificaciones else None,
+            idiomas=idiomas.get(id_operadora, {}),
+        ))
+    return stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild or verify the operadora statistics summary")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args(argv)
+    # Imported here: app.core.database imports this module to register the listeners
+    from app.core.database import get_engine
+
+    with Session(get_engine()) as session:
+        if args.command == "rebuild":
+            totals = rebuild(session)
+            session.commit()
+            logger.info("Rebuilt stats for %d operadoras", len(totals.operadoras))
+            return 0
+        problems = check(session)
+    for problem in problems:
+        print(problem)
+    logger.info("%d inconsistencies", len(problems))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())